@@ -1,5 +1,10 @@
+import asyncio
+from collections import deque
+
 import requests
 
+from http_client import get_http_client, get_async_http_client, CircuitOpenError, UPSTREAM_PAGE_CONCURRENCY
+
 # ==== Configuration ====
 BASE_URL = "https://dev.api.fliz.com.sa"
 
@@ -25,7 +30,6 @@ COMMON_HEADERS = {
     'Accept': 'application/json, text/plain, */*',
     'Accept-Language': 'en-US,en;q=0.9',
     'Connection': 'keep-alive',
-    'If-None-Match': 'W/"239c-x535R61dfiPcPeQlSRaNpyqK92U"',
     'Origin': 'http://dev.fliz.com.sa',
     'Referer': 'http://dev.fliz.com.sa/',
     'deviceType': 'web',
@@ -46,7 +50,8 @@ def make_request(url, method="GET", headers=None, params=None, token_type="guest
         headers = get_headers(token_type)
     
     try:
-        response = requests.request(method, url, headers=headers, params=params)
+        # Pooled session with timeouts, retries and a per-host concurrency cap
+        response = get_http_client().request(method, url, headers=headers, params=params)
         print(f"Request to {url} - Status Code: {response.status_code}")
         if response.status_code == 451:
             print("Warning: API returned 451 - Unavailable For Legal Reasons. This might be due to geographic restrictions or legal compliance issues.")
@@ -59,6 +64,37 @@ def make_request(url, method="GET", headers=None, params=None, token_type="guest
         if err.response.status_code == 451:
             print("The API is currently unavailable due to legal restrictions. Please check your location or try again later.")
         return None
+    except CircuitOpenError as e:
+        # The endpoint is failing; answer at once instead of waiting for another timeout.
+        print(f"Upstream unavailable: {e}")
+        return None
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+async def make_request_async(url, method="GET", headers=None, params=None, token_type="guest"):
+    """Async counterpart of make_request; returns None on the same errors."""
+    import httpx
+
+    if headers is None:
+        headers = get_headers(token_type)
+
+    try:
+        response = await get_async_http_client().request(method, url, headers=headers, params=params)
+        print(f"Request to {url} - Status Code: {response.status_code}")
+        if response.status_code == 451:
+            print("Warning: API returned 451 - Unavailable For Legal Reasons. This might be due to geographic restrictions or legal compliance issues.")
+            return None
+
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as err:
+        print(f"HTTP error: {err}")
+        return None
+    except CircuitOpenError as e:
+        # The endpoint is failing; answer at once instead of waiting for another timeout.
+        print(f"Upstream unavailable: {e}")
+        return None
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
@@ -153,6 +189,157 @@ def get_usr_favourite_list(type="company", page=1, per_page=10):
     }
     return make_request(url, params=params, method="GET", token_type="user")
 
+# ==== Async API Functions ====
+# Same requests as the functions above, awaited on the shared httpx client.
+async def get_delivery_companies_async(page=1, per_page=10, search=None, cat_id=None, type=None, sizeTypetype=None):
+    url = BASE_URL + ENDPOINTS["delivery_list"]
+    params = {
+        "role": "delivery",
+        "page": page,
+        "perPage": per_page
+    }
+    if search:
+        params["search"] = search
+    if cat_id:
+        params["catId"] = cat_id
+    if type:
+        params["type"] = type
+    if sizeTypetype:
+        params["sizeTypetype"] = sizeTypetype
+
+    return await make_request_async(url, params=params, token_type="guest")
+
+async def get_renter_companies_async(role="renter", search=None, page=1, per_page=10):
+    url = BASE_URL + ENDPOINTS["delivery_list"]
+    params = {
+        "role": role,
+        "page": page,
+        "perPage": per_page
+    }
+    if search:
+        params["search"] = search
+
+    return await make_request_async(url, params=params, token_type="guest")
+
+async def get_vehicle_list_async(company_id):
+    url = BASE_URL + ENDPOINTS["vehicle_list"].format(company_id)
+    return await make_request_async(url, token_type="guest")
+
+async def get_equipment_list_async(company_id):
+    url = BASE_URL + ENDPOINTS["equipment_list"].format(company_id)
+    return await make_request_async(url, token_type="guest")
+
+async def get_equipment_details_async(equipment_id):
+    url = BASE_URL + ENDPOINTS["equipment_details"].format(equipment_id)
+    return await make_request_async(url, token_type="guest")
+
+async def get_vehicle_details_async(vehicle_id):
+    url = BASE_URL + ENDPOINTS["vehicle_details"].format(vehicle_id)
+    return await make_request_async(url, token_type="guest")
+
+async def get_booking_list_async(page=1, per_page=10, status=None):
+    url = BASE_URL + ENDPOINTS["booking_list"]
+    params = {
+        "page": page,
+        "perPage": per_page
+    }
+
+    valid_statuses = ["Completed", "Cancelled"]
+    if status and status.capitalize() in valid_statuses:
+        params["status"] = status.capitalize()
+
+    return await make_request_async(url, params=params, token_type="user")
+
+async def get_user_profile_details_async():
+    url = BASE_URL + ENDPOINTS["user_profile_details"]
+    return await make_request_async(url, method="GET", token_type="user")
+
+async def get_payment_list_async(role="user", page=1, per_page=10, search="", start_date="", end_date=""):
+    url = BASE_URL + ENDPOINTS["payment_list"]
+    params = {
+        "role": role,
+        "page": page,
+        "perPage": per_page,
+        "search": search,
+        "startDate": start_date,
+        "endDate": end_date
+    }
+    return await make_request_async(url, params=params, method="GET", token_type="user")
+
+async def get_usr_favourite_list_async(type="company", page=1, per_page=10):
+    url = BASE_URL + ENDPOINTS["favourite_list"]
+    params = {
+        "type": type,
+        "page": page,
+        "perPage": per_page
+    }
+    return await make_request_async(url, params=params, method="GET", token_type="user")
+
+# ==== Pagination ====
+def _page_items(data):
+    """Returns (itemList, total count) of a list response; (None, 0) for a failed request."""
+    if not data:
+        return None, 0
+    body = data.get("data") or {}
+    items = body.get("itemList") or []
+    # Payment lists report their size as "count".
+    total = body.get("totalCount", body.get("count", len(items)))
+    return items, total or 0
+
+async def iterate_pages_async(list_function, per_page=100, concurrency=UPSTREAM_PAGE_CONCURRENCY, **params):
+    """
+    Yields every page of a paginated list endpoint in page order. The first page's
+    totalCount gives the number of pages; the rest are fetched concurrently, at most
+    `concurrency` in flight. A failed page is yielded as None.
+    """
+    first = await list_function(page=1, per_page=per_page, **params)
+    yield first
+    items, total = _page_items(first)
+    if not items:
+        return
+    last_page = -(-total // per_page)
+
+    pending = deque()
+    next_page = 2
+    try:
+        while next_page <= last_page or pending:
+            while next_page <= last_page and len(pending) < concurrency:
+                pending.append((next_page, asyncio.ensure_future(
+                    list_function(page=next_page, per_page=per_page, **params))))
+                next_page += 1
+            page, task = pending.popleft()
+            data = await task
+            if data is None:
+                print(f"Warning: page {page}/{last_page} of {list_function.__name__} failed; its items are missing.")
+            yield data
+    finally:
+        # The consumer stopped early: drop the pages still in flight.
+        for _, task in pending:
+            task.cancel()
+
+async def fetch_all_async(list_function, per_page=100, concurrency=UPSTREAM_PAGE_CONCURRENCY, **params):
+    """
+    Fetches every page of a list endpoint and returns the first page's response
+    with the items of all pages in its itemList. None if any page failed, so a
+    partial list is never cached or counted as complete.
+    """
+    pages = iterate_pages_async(list_function, per_page, concurrency, **params)
+    first = await pages.__anext__()
+    if not first:
+        await pages.aclose()
+        return None
+
+    body = dict(first.get("data") or {})
+    items = list(body.get("itemList") or [])
+    async for data in pages:
+        if data is None:
+            await pages.aclose()
+            return None
+        page_items, _ = _page_items(data)
+        items.extend(page_items or [])
+    body["itemList"] = items
+    return {**first, "data": body}
+
 # # ==== Main Function ====
 # if __name__ == "__main__":
 # #     # Example usage of the functions
@@ -1,8 +1,15 @@
 import json
-from typing import Dict, List, Optional, Tuple, Any
+import logging
+import threading
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Any, Callable, AsyncIterator, Awaitable
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from context import generate_response_from_groq
+from http_client import close_async_http_client, get_response_cache, get_circuit_breakers
+from request_scope import request_scope
+from catalog_cache import get_catalog_cache
 
 # === Initialize FastAPI app ===
 app = FastAPI()
@@ -19,25 +26,59 @@ from retrever import (
     call_function_by_name
 )
 from utils import (
-    handle_company_based_query,
-    handle_vehicle_details,
-    handle_equipment_details,
-    handle_generic_query,
-    handle_payment_query,
-    handle_favourite_query
+    fetch_company_based_query,
+    fetch_vehicle_details,
+    fetch_equipment_details,
+    fetch_generic_query,
+    fetch_payment_query,
+    fetch_favourite_query,
+    fetch_metadata,
+    generate_answer,
+    stream_llm_response
 )
 
 # === Initialize retriever ===
+# The index and embedding model load in a background thread so the process is
+# live immediately; /ready reports when queries can be served.
 retriever = FunctionRetriever("/Users/abhishek/Desktop/flizChatBot/src/function.txt")
-retriever.vector_embedding()
+startup_state = {"error": None}
 
-# === Route Handlers ===
-@app.post("/query")
-def handle_query(request: QueryRequest) -> Dict[str, Any]:
-    query = request.query
-    if "payment" in query.lower() and "list" in query.lower():
-        return handle_payment_query(query)
-    result = retriever.retrieval(query)
+def warm_up_retriever() -> None:
+    try:
+        retriever.vector_embedding()
+        retriever.warm_up()
+        logging.info("Retriever is ready.")
+    except Exception as e:
+        logging.exception("Retriever warm-up failed.")
+        startup_state["error"] = str(e)
+
+@app.on_event("startup")
+def start_warm_up() -> None:
+    threading.Thread(target=warm_up_retriever, name="retriever-warm-up", daemon=True).start()
+
+@app.on_event("shutdown")
+async def close_upstream_client() -> None:
+    await close_async_http_client()
+
+def ensure_ready() -> None:
+    if not retriever.ready:
+        detail = startup_state["error"] or "Retriever is still loading."
+        raise HTTPException(status_code=503, detail=detail)
+
+# === Routing ===
+def is_payment_list_query(query: str) -> bool:
+    # Payment list queries are answered without routing, so they work before the index loads.
+    return "payment" in query.lower() and "list" in query.lower()
+
+async def resolve_fetch(query: str) -> Tuple[Dict[str, Any], Callable[[], Awaitable[Dict[str, Any]]]]:
+    """
+    Routes the query to a function and returns its routing details with the
+    upstream fetch that serves it.
+    """
+    if is_payment_list_query(query):
+        return {"function_name": "get_payment_list", "parameters": {}}, partial(fetch_payment_query, query)
+    ensure_ready()
+    result = await retriever.retrieval(query)
 
     if not result:
         raise HTTPException(status_code=404, detail="No matching function retrieved from the model.")
@@ -52,17 +93,96 @@ def handle_query(request: QueryRequest) -> Dict[str, Any]:
     parameters = details['parameters']
 
     # if function_name == "get_payment_list":
-    #     return handle_payment_query(query)
+    #     return details, partial(fetch_payment_query, query)
     if function_name == "get_usr_favourite_list":
-        return handle_favourite_query(query)
+        return details, partial(fetch_favourite_query, query)
     elif function_name in ["get_vehicle_list", "get_equipment_list"] and "company_id" in parameters:
-        return handle_company_based_query(function_name, parameters["company_id"], query)
+        return details, partial(fetch_company_based_query, function_name, parameters["company_id"])
     elif function_name == "get_vehicle_details":
-        return handle_vehicle_details(query)
+        return details, partial(fetch_vehicle_details, query)
     elif function_name == "get_equipment_details":
-        return handle_equipment_details(query)
-    return handle_generic_query(function_name, parameters, query)
+        return details, partial(fetch_equipment_details, query)
+    return details, partial(fetch_generic_query, function_name, parameters)
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_query(query: str) -> AsyncIterator[str]:
+    """
+    Runs the query pipeline as server-sent events: "routed", "fetched", an optional
+    "summarizing", one "token" per answer fragment and a final "done" carrying the
+    same body as /query. Failures after the stream has started become an "error" event.
+    """
+    try:
+        details, fetch = await resolve_fetch(query)
+        yield format_sse("routed", details)
+
+        async with request_scope():
+            fetched = await fetch()
+        if "response" not in fetched:
+            yield format_sse("done", fetched)
+            return
+        result = fetch_metadata(fetched)
+        yield format_sse("fetched", result)
+
+        answer = []
+        async for event, data in stream_llm_response(fetched["response"], query):
+            if event == "token":
+                answer.append(data["text"])
+            yield format_sse(event, data)
+        result["generated_response"] = "".join(answer)
+        yield format_sse("done", result)
+    except HTTPException as e:
+        yield format_sse("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logging.exception(f"Streaming query failed: '{query}'")
+        yield format_sse("error", {"status_code": 500, "detail": str(e)})
+
+# === Route Handlers ===
+@app.post("/query")
+async def handle_query(request: QueryRequest) -> Dict[str, Any]:
+    _, fetch = await resolve_fetch(request.query)
+    async with request_scope():
+        fetched = await fetch()
+    return await generate_answer(fetched, request.query)
+
+@app.post("/query/stream")
+async def handle_query_stream(request: QueryRequest) -> StreamingResponse:
+    # Readiness is checked up front so a loading server still answers 503.
+    if not is_payment_list_query(request.query):
+        ensure_ready()
+    return StreamingResponse(
+        stream_query(request.query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/stats/routing-cache")
+async def routing_cache_stats() -> Dict[str, Any]:
+    return retriever.routing_cache.stats()
+
+@app.get("/stats/upstream-cache")
+async def upstream_cache_stats() -> Dict[str, Any]:
+    return get_response_cache().stats()
+
+@app.get("/stats/upstream-circuits")
+async def upstream_circuit_stats() -> Dict[str, Any]:
+    return get_circuit_breakers().stats()
+
+@app.get("/stats/catalog-cache")
+async def catalog_cache_stats() -> Dict[str, Any]:
+    return get_catalog_cache().stats()
+
+# === Health Check Routes ===
+@app.get("/health")
+async def health_check() -> Dict[str, str]:
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def readiness_check() -> Dict[str, str]:
+    ensure_ready()
+    return {"status": "ready"}
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Hello!"}
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark of split_text_into_chunks against the previous per-word chunker,
+on a synthetic booking list serialized the way the handlers send it to the LLM.
+
+Usage:
+    python bench_chunker.py                    # ~100k-token booking list
+    python bench_chunker.py --items 5000 --repeat 3
+"""
+import sys
+import json
+import time
+import argparse
+
+from llm_registry import count_tokens, get_encoding
+from sumary import MAX_TOKENS_PER_CHUNK, split_text_into_chunks
+
+
+def legacy_split_text_into_chunks(text: str, max_tokens: int = MAX_TOKENS_PER_CHUNK) -> list:
+    # Implementation replaced by split_text_into_chunks: one encode call per word.
+    encoding = get_encoding()
+    words = text.split()
+    chunks = []
+    current_chunk = []
+    current_tokens = 0
+
+    for word in words:
+        word_tokens = len(encoding.encode(word))
+        if current_tokens + word_tokens > max_tokens:
+            chunks.append(" ".join(current_chunk))
+            current_chunk = [word]
+            current_tokens = word_tokens
+        else:
+            current_chunk.append(word)
+            current_tokens += word_tokens
+
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+
+    return chunks
+
+
+def booking_payload(items: int) -> str:
+    item_list = [
+        {
+            "bookingId": f"BK-{i:06d}",
+            "status": ["pending", "confirmed", "cancelled", "completed"][i % 4],
+            "equipment": {"name": f"Excavator {i % 37}", "category": "Heavy Equipment", "price": 150 + i % 90},
+            "company": {"name": f"Company {i % 113}", "city": "Riyadh", "rating": round(3 + (i % 20) / 10, 1)},
+            "startDate": "2025-07-02",
+            "endDate": "2025-07-09",
+        }
+        for i in range(items)
+    ]
+    return json.dumps({"status": 200, "data": {"totalCount": items, "itemList": item_list}}, indent=3)
+
+
+def valid_json_chunks(chunks: list) -> int:
+    valid = 0
+    for chunk in chunks:
+        try:
+            json.loads(chunk)
+            valid += 1
+        except ValueError:
+            pass
+    return valid
+
+
+def timed(function, text: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = function(text)
+        best = min(best, time.perf_counter() - start)
+    return chunks, best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the summary chunker.")
+    parser.add_argument("--items", type=int, default=850, help="Bookings in the synthetic payload.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation; the best is reported.")
+    args = parser.parse_args(argv)
+
+    text = booking_payload(args.items)
+    print(f"Payload: {args.items} bookings, {len(text)} chars, {count_tokens(text)} tokens")
+
+    for label, function in (("legacy", legacy_split_text_into_chunks), ("current", split_text_into_chunks)):
+        chunks, seconds = timed(function, text, args.repeat)
+        largest = max(count_tokens(chunk) for chunk in chunks)
+        print(f"{label:>8}: {seconds * 1000:8.1f} ms  {len(chunks)} chunks  "
+              f"largest {largest} tokens  {valid_json_chunks(chunks)}/{len(chunks)} valid JSON")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Builds or incrementally updates the function FAISS index ahead of deploy, so
+workers only load it at startup.
+
+Usage:
+    python build_index.py                      # build / update fun_Vector_DB from function.txt
+    python build_index.py --check              # exit 1 if the index is stale
+    python build_index.py --catalog other.txt --index-path other_Vector_DB
+"""
+import os
+import sys
+import argparse
+import logging
+
+from function_catalog import load_catalog
+from embedding_backends import create_embeddings, embedding_model_id
+from index_store import (
+    FAISS_INDEX_PATH,
+    diff_manifest, entry_hash, index_files_exist, read_manifest, sync_index
+)
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "function.txt")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build or update the function FAISS index.")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help="Function catalog file to index.")
+    parser.add_argument("--index-path", default=FAISS_INDEX_PATH, help="Directory holding the FAISS index.")
+    parser.add_argument("--check", action="store_true", help="Only report whether the index is up to date.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    documents = load_catalog(args.catalog)
+
+    if args.check:
+        hashes = {doc.metadata["name"]: entry_hash(doc) for doc in documents}
+        diff = diff_manifest(read_manifest(args.index_path), hashes, embedding_model_id())
+        if diff is None or not index_files_exist(args.index_path):
+            print(f"{args.index_path}: needs a full build.")
+            return 1
+        changed, removed = diff
+        if changed or removed:
+            print(f"{args.index_path}: stale ({len(changed)} changed, {len(removed)} removed entries).")
+            return 1
+        print(f"{args.index_path}: up to date.")
+        return 0
+
+    _, status = sync_index(args.index_path, documents, create_embeddings())
+    print(f"{args.index_path}: {status}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+TTL cache of the Fliz catalog: the company lists and each company's asset list.
+
+Entries live for CATALOG_CACHE_TTL seconds and are reloaded in the background once
+CATALOG_REFRESH_AHEAD of that has passed, so busy entries never expire in a request.
+Concurrent misses for one entry share a single load. A failed load keeps serving
+the previous value, if any, and is retried after an exponentially growing backoff
+instead of on every request. The cache is used from the server's event loop.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from functools import lru_cache, partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from dotenv import load_dotenv
+
+from api_function import (
+    fetch_all_async,
+    get_delivery_companies_async, get_renter_companies_async,
+    get_vehicle_list_async, get_equipment_list_async
+)
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+# Fraction of the TTL after which a served entry is reloaded in the background.
+CATALOG_REFRESH_AHEAD = float(os.getenv("CATALOG_REFRESH_AHEAD", "0.8"))
+CATALOG_ERROR_BACKOFF = float(os.getenv("CATALOG_ERROR_BACKOFF", "5"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "512"))
+MAX_ERROR_BACKOFF = 300.0
+
+Loader = Callable[[], Awaitable[Optional[Any]]]
+
+
+# -------------------------
+# Cache
+# -------------------------
+class CatalogCache:
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL, refresh_ahead: float = CATALOG_REFRESH_AHEAD,
+                 error_backoff: float = CATALOG_ERROR_BACKOFF, max_entries: int = CATALOG_CACHE_SIZE):
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.error_backoff = error_backoff
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._loads: Dict[Hashable, asyncio.Future] = {}
+        self._refreshes = set()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    async def get(self, key: Hashable, loader: Loader) -> Optional[Any]:
+        """
+        Returns the cached value of `key`, loading it with `loader` when it is missing
+        or expired. A loader result of None counts as a failed load.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if entry["value"] is not None and now < entry["expires"]:
+                self.hits += 1
+                # A failed refresh waits out its backoff like any other failed load.
+                if now >= entry["refresh_at"] and now >= entry["retry_at"]:
+                    self._refresh_in_background(key, loader)
+                return entry["value"]
+            if now < entry["retry_at"]:
+                # Still backing off after a failed load: serve what we have.
+                self.hits += 1
+                return entry["value"]
+        self.misses += 1
+        return await self._load(key, loader)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    async def _load(self, key: Hashable, loader: Loader) -> Optional[Any]:
+        load = self._loads.get(key)
+        if load is None:
+            load = self._loads[key] = asyncio.ensure_future(self._run_loader(key, loader))
+            load.add_done_callback(partial(self._load_done, key))
+        # A caller that is cancelled must not cancel the load the others are waiting for.
+        return await asyncio.shield(load)
+
+    def _load_done(self, key: Hashable, load: asyncio.Future) -> None:
+        if self._loads.get(key) is load:
+            del self._loads[key]
+
+    async def _run_loader(self, key: Hashable, loader: Loader) -> Optional[Any]:
+        try:
+            value = await loader()
+        except Exception as e:
+            logging.warning(f"Loading catalog entry {key} failed: {e}")
+            value = None
+
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if value is None:
+            self.errors += 1
+            failures = entry["failures"] + 1 if entry else 1
+            backoff = min(self.error_backoff * 2 ** (failures - 1), MAX_ERROR_BACKOFF)
+            stale = entry["value"] if entry else None
+            self._store(key, {
+                "value": stale,
+                "expires": entry["expires"] if entry else now,
+                "refresh_at": entry["refresh_at"] if entry else now,
+                "retry_at": now + backoff,
+                "failures": failures,
+            })
+            logging.warning(f"Catalog entry {key} unavailable; retrying in {backoff:.0f}s"
+                            + (" and serving the previous value" if stale is not None else ""))
+            return stale
+
+        self._store(key, {
+            "value": value,
+            "expires": now + self.ttl,
+            "refresh_at": now + self.ttl * self.refresh_ahead,
+            "retry_at": now,
+            "failures": 0,
+        })
+        return value
+
+    def _store(self, key: Hashable, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _refresh_in_background(self, key: Hashable, loader: Loader) -> None:
+        if key in self._loads:
+            return
+        self.refreshes += 1
+        task = asyncio.ensure_future(self._load(key, loader))
+        # The loop only keeps weak references to tasks.
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "loading": len(self._loads),
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_catalog_cache() -> CatalogCache:
+    return CatalogCache()
+
+
+# -------------------------
+# Catalog Lookups
+# -------------------------
+COMPANY_LOADERS = {
+    "delivery": partial(fetch_all_async, get_delivery_companies_async),
+    "renter": partial(fetch_all_async, get_renter_companies_async),
+}
+ASSET_LOADERS = {
+    "delivery": get_vehicle_list_async,
+    "renter": get_equipment_list_async,
+}
+
+
+async def get_companies(role: str) -> Optional[Dict[str, Any]]:
+    """
+    Every company of `role` ("delivery" or "renter"), as one list response.
+    """
+    return await get_catalog_cache().get(("companies", role), COMPANY_LOADERS[role])
+
+
+async def get_company_assets(role: str, company_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The vehicle list of a delivery company or the equipment list of a renter company.
+    """
+    return await get_catalog_cache().get(("assets", role, company_id), partial(ASSET_LOADERS[role], company_id))
@@ -0,0 +1,106 @@
+import re
+import logging
+from typing import Dict, Any, List
+
+# -------------------------
+# Patterns
+# -------------------------
+# "Function: name(args)" / "Function Name: name"
+TITLED_HEADER = re.compile(r"^Function(?: Name)?:\s*(\w+)\s*(?:\((.*)\))?\s*$")
+# "name(args)" / "name:" on a line of its own
+BARE_HEADER = re.compile(r"^([a-z]+(?:_[a-z0-9]+)+)\s*(?:\((.*)\))?\s*:?\s*$")
+PARAMETER_BULLET = re.compile(r"^\s*-?\s*(\w+)\s*(?:\([^)]*\))?\s*:\s+\S")
+EXAMPLE_LINE = re.compile(r"^\s*User Query:\s*(.*)$")
+# Wrapper lines copied from the Python snippets the catalog was written in.
+NOISE_LINE = re.compile(r'^\s*(#.*|description\s*=\s*"""\s*|"""\s*)$')
+
+
+# -------------------------
+# Parsing
+# -------------------------
+def parse_catalog(text: str) -> List[Dict[str, Any]]:
+    """
+    Splits a function catalog into one entry per function with its name, text,
+    parameters and example queries. Blocks repeating a function name are merged;
+    text before the first function is treated as a note shared by every entry.
+    """
+    preamble: List[str] = []
+    entries: Dict[str, Dict[str, Any]] = {}
+    current = None
+
+    for line in text.splitlines():
+        if NOISE_LINE.match(line):
+            continue
+
+        header = TITLED_HEADER.match(line) or BARE_HEADER.match(line)
+        if header:
+            name = header.group(1)
+            current = entries.setdefault(name, {"name": name, "lines": [], "parameters": []})
+            _add_parameters(current, _signature_parameters(header.group(2)))
+            current["lines"].append(line)
+            continue
+
+        if current is None:
+            preamble.append(line)
+            continue
+
+        current["lines"].append(line)
+        bullet = PARAMETER_BULLET.match(line)
+        if bullet and bullet.group(1) not in ("Purpose", "Parameters", "Description", "Function", "IMPORTANT"):
+            _add_parameters(current, [bullet.group(1)])
+
+    note = "\n".join(preamble).strip()
+    catalog = []
+    for entry in entries.values():
+        body = "\n".join(entry["lines"]).strip()
+        examples = [
+            query
+            for line in entry["lines"]
+            for match in [EXAMPLE_LINE.match(line)] if match
+            for query in re.findall(r'"([^"]+)"', match.group(1))
+        ]
+        catalog.append({
+            "name": entry["name"],
+            "content": f"{note}\n\n{body}" if note else body,
+            "parameters": entry["parameters"],
+            "examples": examples,
+        })
+    return catalog
+
+
+def _signature_parameters(signature: str) -> List[str]:
+    if not signature:
+        return []
+    return [part.split("=")[0].strip() for part in signature.split(",") if part.strip()]
+
+
+def _add_parameters(entry: Dict[str, Any], names: List[str]) -> None:
+    for name in names:
+        if name not in entry["parameters"]:
+            entry["parameters"].append(name)
+
+
+def load_catalog(file_path: str) -> List[Any]:
+    """
+    Loads a function catalog file as one Document per function, so top-k retrieval
+    sends only the matched functions to the LLM.
+    """
+    from langchain.schema import Document
+
+    with open(file_path, 'r') as file:
+        text = file.read()
+
+    documents = [
+        Document(
+            page_content=entry["content"],
+            metadata={
+                "name": entry["name"],
+                "parameters": entry["parameters"],
+                "examples": entry["examples"],
+                "source": file_path,
+            },
+        )
+        for entry in parse_catalog(text)
+    ]
+    logging.info(f"Loaded {len(documents)} functions from {file_path}")
+    return documents
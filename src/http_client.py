@@ -0,0 +1,635 @@
+"""
+Shared HTTP client layer for the Fliz API.
+
+One pooled requests.Session (and one httpx.AsyncClient for the async functions)
+serves every upstream call, with connect/read timeouts, jittered retries on
+idempotent requests and a cap on requests in flight per host. GET responses are
+cached by URL, params and token, revalidated with If-None-Match/If-Modified-Since
+and served without a request while their Cache-Control max-age lasts.
+
+Shortly after expiring, a cached response is still served while it is refreshed
+in the background, and when the upstream fails the last good response is served
+instead of the error. A circuit breaker per endpoint stops sending requests once
+too many of them fail, and lets a single probe through after a cooldown.
+"""
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+import requests
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "30"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_RETRY_BACKOFF = float(os.getenv("UPSTREAM_RETRY_BACKOFF", "0.3"))
+UPSTREAM_MAX_PER_HOST = int(os.getenv("UPSTREAM_MAX_PER_HOST", "10"))
+# Pages of one paginated list fetched at once.
+UPSTREAM_PAGE_CONCURRENCY = int(os.getenv("UPSTREAM_PAGE_CONCURRENCY", "4"))
+# Cached GET responses; 0 disables conditional requests.
+UPSTREAM_CACHE_SIZE = int(os.getenv("UPSTREAM_CACHE_SIZE", "256"))
+# Seconds past expiry a cached response with a max-age or validator is served while
+# it is refreshed in the background, unless the response sets its own stale-while-revalidate.
+UPSTREAM_STALE_WHILE_REVALIDATE = int(os.getenv("UPSTREAM_STALE_WHILE_REVALIDATE", "30"))
+# Seconds past expiry a cached response is served when the upstream fails.
+UPSTREAM_STALE_IF_ERROR = int(os.getenv("UPSTREAM_STALE_IF_ERROR", "3600"))
+# Failure rate over the last UPSTREAM_BREAKER_WINDOW requests that opens an endpoint's circuit.
+UPSTREAM_BREAKER_THRESHOLD = float(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "0.5"))
+UPSTREAM_BREAKER_WINDOW = int(os.getenv("UPSTREAM_BREAKER_WINDOW", "20"))
+UPSTREAM_BREAKER_MIN_CALLS = int(os.getenv("UPSTREAM_BREAKER_MIN_CALLS", "5"))
+# Seconds an open circuit rejects requests before letting a probe through.
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+# Longest wait between retries, including a server's Retry-After.
+MAX_RETRY_DELAY = 5.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses that count against an endpoint's circuit and are replaced by a stale response.
+FAILURE_STATUSES = RETRY_STATUSES | {451}
+# Path segments that are record ids; endpoints are compared without them.
+ID_SEGMENT = re.compile(r"/(?:[0-9a-fA-F]{24}|\d+)(?=/|$)")
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+# -------------------------
+# Retry Policy
+# -------------------------
+def should_retry(method: str, attempt: int, status_code: Optional[int] = None) -> bool:
+    """
+    Retries idempotent requests that failed to connect, timed out (status_code
+    None) or returned a transient status, up to UPSTREAM_MAX_RETRIES times.
+    """
+    if method.upper() not in IDEMPOTENT_METHODS or attempt >= UPSTREAM_MAX_RETRIES:
+        return False
+    return status_code is None or status_code in RETRY_STATUSES
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Exponential backoff with full jitter, so retrying workers do not hit the
+    upstream in lockstep. A numeric Retry-After header takes precedence.
+    """
+    if retry_after and retry_after.strip().isdigit():
+        return min(float(retry_after), MAX_RETRY_DELAY)
+    return random.uniform(0, min(UPSTREAM_RETRY_BACKOFF * (2 ** attempt), MAX_RETRY_DELAY))
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def _endpoint(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.netloc + ID_SEGMENT.sub("/{id}", parts.path)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while the endpoint's circuit is open.
+    """
+
+
+# -------------------------
+# Circuit Breaker
+# -------------------------
+class CircuitBreaker:
+    """
+    Closed: requests pass and their outcomes are recorded over a rolling window.
+    Open: requests are rejected until the cooldown has passed. Half-open: one probe
+    is let through; its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name: str, threshold: float = UPSTREAM_BREAKER_THRESHOLD, window: int = UPSTREAM_BREAKER_WINDOW,
+                 min_calls: int = UPSTREAM_BREAKER_MIN_CALLS, cooldown: float = UPSTREAM_BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.rejected = 0
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half-open"
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self.state == "half-open":
+                self._probing = False
+                if success:
+                    logging.info(f"Circuit for {self.name} closed")
+                    self.state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.threshold:
+                self._open()
+
+    def release(self) -> None:
+        """
+        Gives up a probe whose outcome is unknown, e.g. because it was cancelled.
+        """
+        with self._lock:
+            self._probing = False
+
+    def _open(self) -> None:
+        logging.warning(f"Circuit for {self.name} opened; failing fast for {self.cooldown:.0f}s")
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": self._outcomes.count(False),
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreakers:
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> CircuitBreaker:
+        endpoint = _endpoint(url)
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(endpoint)
+            return self._breakers[endpoint]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+@lru_cache(maxsize=1)
+def get_circuit_breakers() -> CircuitBreakers:
+    return CircuitBreakers()
+
+
+# -------------------------
+# Conditional Response Cache
+# -------------------------
+class ResponseCache:
+    """
+    LRU cache of GET responses with their validators. Works with requests and
+    httpx responses alike; the cached response object is returned on a hit.
+    """
+
+    def __init__(self, max_entries: int = UPSTREAM_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.stale_on_error = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(url: str, params=None, headers=None) -> Tuple:
+        query = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return url, query, (headers or {}).get("Authorization")
+
+    def lookup(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.monotonic() < entry["expires"]
+
+    def can_serve_stale(self, entry: Dict[str, Any]) -> bool:
+        """
+        Whether the expired entry may be served while it is refreshed in the background.
+        """
+        return time.monotonic() < entry["expires"] + entry["stale_while_revalidate"]
+
+    def can_serve_on_error(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and time.monotonic() < entry["expires"] + UPSTREAM_STALE_IF_ERROR
+
+    def begin_refresh(self, key: Tuple) -> bool:
+        """
+        Claims the background refresh of an entry; False if one is already running.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Tuple) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def validators(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key: Tuple, response) -> None:
+        """
+        Caches a 200 response unless it is marked no-store. Without a validator or a
+        max-age it is only served stale, as the last good response.
+        """
+        directives = _cache_control(response.headers.get("Cache-Control"))
+        if "no-store" in directives:
+            return
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        entry = {
+            "response": response,
+            "etag": etag,
+            "last_modified": last_modified,
+            "expires": time.monotonic() + _max_age(directives),
+            "stale_while_revalidate": _stale_while_revalidate(directives, bool(etag or last_modified)),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def refresh(self, entry: Dict[str, Any], not_modified) -> None:
+        """
+        Extends a cached entry after a 304, which may carry new caching headers.
+        """
+        directives = _cache_control(not_modified.headers.get("Cache-Control"))
+        entry["expires"] = time.monotonic() + _max_age(directives)
+        entry["etag"] = not_modified.headers.get("ETag") or entry["etag"]
+        if directives:
+            entry["stale_while_revalidate"] = _stale_while_revalidate(directives, True)
+
+    def count(self, counter: str) -> None:
+        """
+        Increments one of the hit/miss counters; requests on several threads update them at once.
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "refreshes": self.refreshes,
+                "stale_on_error": self.stale_on_error,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+def _cache_control(value: Optional[str]) -> Dict[str, str]:
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+
+def _max_age(directives: Dict[str, str]) -> int:
+    if "no-cache" in directives:
+        return 0
+    return _seconds(directives.get("max-age", "0"))
+
+
+def _stale_while_revalidate(directives: Dict[str, str], has_validator: bool) -> int:
+    """
+    The response's stale-while-revalidate window; the UPSTREAM_STALE_WHILE_REVALIDATE
+    default only applies to responses with a max-age or a validator. Others are only
+    served stale as the last good response, on error.
+    """
+    if "no-cache" in directives or "must-revalidate" in directives:
+        return 0
+    if "stale-while-revalidate" in directives:
+        return _seconds(directives["stale-while-revalidate"])
+    if has_validator or "max-age" in directives:
+        return UPSTREAM_STALE_WHILE_REVALIDATE
+    return 0
+
+
+def _seconds(value: str) -> int:
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        return 0
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> ResponseCache:
+    return ResponseCache()
+
+
+# -------------------------
+# Blocking Client
+# -------------------------
+class HttpClient:
+    def __init__(self, max_per_host: int = UPSTREAM_MAX_PER_HOST,
+                 connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT, read_timeout: float = UPSTREAM_READ_TIMEOUT):
+        self.session = requests.Session()
+        # Retries are handled in _send() so they share the per-host limit and jitter.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_per_host = max_per_host
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = _host(url)
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def request(self, method: str, url: str, headers=None, params=None) -> requests.Response:
+        """
+        Sends the request and returns the final response, answering GETs from the
+        response cache when possible. Connection errors and timeouts are raised
+        once retries are exhausted, and CircuitOpenError while the endpoint's
+        circuit is open, unless a cached response can stand in.
+        """
+        cache = get_response_cache()
+        if method.upper() != "GET" or not cache.enabled:
+            return self._guarded_send(method, url, headers, params)
+
+        key = cache.key(url, params, headers)
+        entry = cache.lookup(key)
+        if entry is not None and cache.is_fresh(entry):
+            cache.count("hits")
+            return entry["response"]
+        if entry is not None and cache.can_serve_stale(entry):
+            # Served stale whether or not this request starts the refresh, so callers
+            # never wait on the upstream while a refresh is already in flight.
+            cache.count("stale_hits")
+            if cache.begin_refresh(key):
+                _refresh_executor().submit(self._refresh, cache, key, entry, url, headers, params)
+            return entry["response"]
+        return self._fetch(cache, key, entry, url, headers, params)
+
+    def _fetch(self, cache: ResponseCache, key: Tuple, entry: Optional[Dict[str, Any]], url: str, headers, params,
+               counter: str = "misses"):
+        conditional = {**(headers or {}), **cache.validators(entry)} if entry else headers
+        try:
+            response = self._guarded_send("GET", url, conditional, params)
+        except (CircuitOpenError, requests.exceptions.RequestException) as e:
+            if not cache.can_serve_on_error(entry):
+                raise
+            return _stale_on_error(cache, entry, url, e)
+        if response.status_code in FAILURE_STATUSES and cache.can_serve_on_error(entry):
+            return _stale_on_error(cache, entry, url, response.status_code)
+        return _cached_response(cache, key, entry, response, counter)
+
+    def _refresh(self, cache: ResponseCache, key: Tuple, entry: Dict[str, Any], url: str, headers, params) -> None:
+        try:
+            self._fetch(cache, key, entry, url, headers, params, counter="refreshes")
+        except Exception as e:
+            logging.warning(f"Background refresh of {url} failed: {e}")
+        finally:
+            cache.end_refresh(key)
+
+    def _guarded_send(self, method: str, url: str, headers=None, params=None) -> requests.Response:
+        breaker = get_circuit_breakers().get(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit for {breaker.name} is open")
+        try:
+            response = self._send(method, url, headers, params)
+        except Exception:
+            breaker.record(False)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record(response.status_code not in FAILURE_STATUSES)
+        return response
+
+    def _send(self, method: str, url: str, headers=None, params=None) -> requests.Response:
+        attempt = 0
+        while True:
+            try:
+                with self._host_limit(url):
+                    response = self.session.request(method, url, headers=headers, params=params, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not should_retry(method, attempt):
+                    raise
+                delay = retry_delay(attempt)
+                logging.warning(f"{method} {url} failed ({e}); retrying in {delay:.2f}s")
+            else:
+                if not should_retry(method, attempt, response.status_code):
+                    return response
+                delay = retry_delay(attempt, response.headers.get("Retry-After"))
+                logging.warning(f"{method} {url} returned {response.status_code}; retrying in {delay:.2f}s")
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+
+@lru_cache(maxsize=1)
+def _refresh_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="upstream-refresh")
+
+
+def _stale_on_error(cache: ResponseCache, entry: Dict[str, Any], url: str, error):
+    cache.count("stale_on_error")
+    logging.warning(f"GET {url} failed ({error}); serving the last good response")
+    return entry["response"]
+
+
+def _cached_response(cache: ResponseCache, key: Tuple, entry: Optional[Dict[str, Any]], response,
+                     counter: str = "misses"):
+    """
+    Serves the cached body for a 304 and caches new 200 responses. Full responses
+    are counted under `counter`: "misses" for callers, "refreshes" in the background.
+    """
+    if response.status_code == 304 and entry is not None:
+        cache.count("revalidations")
+        cache.refresh(entry, response)
+        return entry["response"]
+    cache.count(counter)
+    if response.status_code == 200:
+        cache.store(key, response)
+    return response
+
+
+# -------------------------
+# Async Client
+# -------------------------
+class AsyncHttpClient:
+    """
+    Async counterpart of HttpClient on httpx. Like the httpx client it wraps, it
+    belongs to the event loop that first uses it.
+    """
+
+    def __init__(self, max_per_host: int = UPSTREAM_MAX_PER_HOST,
+                 connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT, read_timeout: float = UPSTREAM_READ_TIMEOUT):
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=max_per_host),
+        )
+        self.max_per_host = max_per_host
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._refreshes = set()
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = _host(url)
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    async def request(self, method: str, url: str, headers=None, params=None):
+        cache = get_response_cache()
+        if method.upper() != "GET" or not cache.enabled:
+            return await self._guarded_send(method, url, headers, params)
+
+        key = cache.key(url, params, headers)
+        entry = cache.lookup(key)
+        if entry is not None and cache.is_fresh(entry):
+            cache.count("hits")
+            return entry["response"]
+        if entry is not None and cache.can_serve_stale(entry):
+            # Served stale whether or not this request starts the refresh, so callers
+            # never wait on the upstream while a refresh is already in flight.
+            cache.count("stale_hits")
+            if cache.begin_refresh(key):
+                task = asyncio.ensure_future(self._refresh(cache, key, entry, url, headers, params))
+                # The loop only keeps weak references to tasks.
+                self._refreshes.add(task)
+                task.add_done_callback(self._refreshes.discard)
+            return entry["response"]
+        return await self._fetch(cache, key, entry, url, headers, params)
+
+    async def _fetch(self, cache: ResponseCache, key: Tuple, entry: Optional[Dict[str, Any]], url: str, headers, params,
+                     counter: str = "misses"):
+        import httpx
+
+        conditional = {**(headers or {}), **cache.validators(entry)} if entry else headers
+        try:
+            response = await self._guarded_send("GET", url, conditional, params)
+        except (CircuitOpenError, httpx.TransportError) as e:
+            if not cache.can_serve_on_error(entry):
+                raise
+            return _stale_on_error(cache, entry, url, repr(e))
+        if response.status_code in FAILURE_STATUSES and cache.can_serve_on_error(entry):
+            return _stale_on_error(cache, entry, url, response.status_code)
+        return _cached_response(cache, key, entry, response, counter)
+
+    async def _refresh(self, cache: ResponseCache, key: Tuple, entry: Dict[str, Any], url: str, headers, params) -> None:
+        try:
+            await self._fetch(cache, key, entry, url, headers, params, counter="refreshes")
+        except Exception as e:
+            logging.warning(f"Background refresh of {url} failed: {e!r}")
+        finally:
+            cache.end_refresh(key)
+
+    async def _guarded_send(self, method: str, url: str, headers=None, params=None):
+        breaker = get_circuit_breakers().get(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit for {breaker.name} is open")
+        try:
+            response = await self._send(method, url, headers, params)
+        except Exception:
+            breaker.record(False)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record(response.status_code not in FAILURE_STATUSES)
+        return response
+
+    async def _send(self, method: str, url: str, headers=None, params=None):
+        import httpx
+
+        attempt = 0
+        while True:
+            try:
+                async with self._host_limit(url):
+                    response = await self.client.request(method, url, headers=headers, params=params)
+            except httpx.TransportError as e:
+                if not should_retry(method, attempt):
+                    raise
+                delay = retry_delay(attempt)
+                logging.warning(f"{method} {url} failed ({e!r}); retrying in {delay:.2f}s")
+            else:
+                if not should_retry(method, attempt, response.status_code):
+                    return response
+                delay = retry_delay(attempt, response.headers.get("Retry-After"))
+                logging.warning(f"{method} {url} returned {response.status_code}; retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        for task in list(self._refreshes):
+            task.cancel()
+        await asyncio.gather(*self._refreshes, return_exceptions=True)
+        await self.client.aclose()
+
+
+# -------------------------
+# Shared Instances
+# -------------------------
+@lru_cache(maxsize=1)
+def get_http_client() -> HttpClient:
+    return HttpClient()
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> AsyncHttpClient:
+    return AsyncHttpClient()
+
+
+async def close_async_http_client() -> None:
+    """
+    Closes the shared async client, e.g. on application shutdown.
+    """
+    if get_async_http_client.cache_info().currsize:
+        await get_async_http_client().aclose()
+        get_async_http_client.cache_clear()
@@ -0,0 +1,125 @@
+"""
+Process-wide LLM clients and tokenizers.
+
+Chat clients are created once per (model, temperature) and share one httpx
+connection pool, so answers, summaries and routing reuse open TLS connections
+instead of building a client per call. Tokenizer encoders are loaded once per
+encoding name.
+"""
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Model that picks the function to call for a query.
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "Llama3-8b-8192")
+# Model that writes answers and summaries from API payloads.
+ANSWER_MODEL_NAME = os.getenv("ANSWER_MODEL_NAME", "meta-llama/llama-4-scout-17b-16e-instruct")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+TOKEN_ENCODING = "gpt2"
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, Optional[float]], Any] = {}
+# Async connection pools are bound to the event loop that opened them, so clients
+# used from a coroutine are kept per loop and dropped with it.
+_loop_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+# -------------------------
+# HTTP Connection Pools
+# -------------------------
+def _limits():
+    import httpx
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+
+
+@lru_cache(maxsize=1)
+def get_http_client():
+    """
+    Returns the shared synchronous httpx client used by every chat client.
+    """
+    import httpx
+    return httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT)
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client():
+    """
+    Returns the async httpx client of clients created outside an event loop. It
+    binds to the first loop that uses it: the server's loop for the routing chain.
+    """
+    return _async_http_client()
+
+
+def _async_http_client():
+    import httpx
+    return httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT)
+
+
+# -------------------------
+# Chat Clients
+# -------------------------
+def get_llm(model_name: str = ANSWER_MODEL_NAME, temperature: Optional[float] = None):
+    """
+    Returns the shared ChatGroq client for `model_name`. Called from a coroutine, the
+    client's async connection pool belongs to the running event loop.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    key = (model_name, temperature)
+    with _lock:
+        clients = _clients if loop is None else _loop_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = _create_llm(model_name, temperature, in_loop=loop is not None)
+    return client
+
+
+def _create_llm(model_name: str, temperature: Optional[float], in_loop: bool):
+    from langchain_groq import ChatGroq
+
+    if not GROQ_API_KEY:
+        raise ValueError("GROQ_API_KEY is not set in environment variables.")
+
+    options: Dict[str, Any] = {
+        "http_client": get_http_client(),
+        "http_async_client": _async_http_client() if in_loop else get_async_http_client(),
+    }
+    if temperature is not None:
+        options["temperature"] = temperature
+    logging.info(f"Creating LLM client for {model_name}")
+    return ChatGroq(model_name=model_name, api_key=GROQ_API_KEY, **options)
+
+
+def get_routing_llm():
+    """
+    Returns the deterministic client used for function routing.
+    """
+    return get_llm(LLM_MODEL_NAME, temperature=0)
+
+
+# -------------------------
+# Tokenizers
+# -------------------------
+@lru_cache(maxsize=None)
+def get_encoding(name: str = TOKEN_ENCODING):
+    from tiktoken import get_encoding as tiktoken_encoding
+    return tiktoken_encoding(name)
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text))
@@ -1,18 +1,13 @@
 import os
-import glob
 import json
+import asyncio
 import logging
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
+import numpy as np
+
+from routing_cache import SemanticRoutingCache
 
 # -------------------------
 # Environment and Constants
@@ -22,17 +17,15 @@ load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 
-FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "fun_Vector_DB")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "Llama3-8b-8192")
-EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "2"))
+ROUTING_MAX_CONCURRENCY = int(os.getenv("ROUTING_MAX_CONCURRENCY", "8"))
 
 # -------------------------
 # LLM and Prompt Setup
 # -------------------------
-llm = ChatGroq(groq_api_key=GROQ_API_KEY, model_name=LLM_MODEL_NAME, temperature=0)
-
-prompt = ChatPromptTemplate.from_template(
+# LangChain, Groq and the embedding model are imported on first use so the API
+# process starts serving /health before they are loaded.
+PROMPT_TEMPLATE = (
     """Retrieve the most relevant function(s) from the provided context based on the user's query. 
     Focus on returning a valid JSON object with the function name, description, parameters, and code snippet. 
     Respond only with a valid JSON object. Do not include any explanation or extra text. 
@@ -65,54 +58,141 @@ class FunctionRetriever:
         logging.info(f"Initializing FunctionRetriever with file: {file_path}")
         self.file_path = file_path
         self.vectors = None
+        self.embeddings = None
+        self.document_chain = None
+        self.routing_cache = SemanticRoutingCache()
 
     def vector_embedding(self) -> Dict[str, str]:
         """
-        Creates or loads FAISS vector embeddings for the provided file.
+        Loads the FAISS index for the provided file, re-embedding only the catalog
+        entries that changed since the index manifest was written.
         """
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-
         if self.vectors:
             logging.info("FAISS index already loaded.")
             return {"status": "FAISS index already loaded."}
 
-        if os.path.exists(FAISS_INDEX_PATH) and glob.glob(f"{FAISS_INDEX_PATH}/*"):
-            logging.info("Loading existing FAISS index from disk...")
-            self.vectors = FAISS.load_local(
-                FAISS_INDEX_PATH, embeddings, allow_dangerous_deserialization=True
-            )
-            logging.info("FAISS index loaded successfully.")
-            return {"status": "Loaded existing FAISS index."}
+        from function_catalog import load_catalog
+        from embedding_backends import create_embeddings
+        from index_store import FAISS_INDEX_PATH, INDEX_BUILD_ON_STARTUP, sync_index
 
-        logging.info("Creating vector embeddings from file content...")
-        with open(self.file_path, 'r') as file:
-            text = file.read()
+        self.embeddings = create_embeddings()
+        documents = load_catalog(self.file_path)
+        self.vectors, status = sync_index(
+            FAISS_INDEX_PATH, documents, self.embeddings, update=INDEX_BUILD_ON_STARTUP
+        )
+        self._build_chains()
+        return {"status": status}
 
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=2000)
-        chunks = text_splitter.split_text(text)
-        logging.info(f"Split text into {len(chunks)} chunks.")
+    def _build_chains(self) -> None:
+        """
+        Builds the document chain once so every request reuses it.
+        """
+        from langchain.chains.combine_documents import create_stuff_documents_chain
+        from langchain_core.prompts import ChatPromptTemplate
+        from llm_registry import get_routing_llm
+
+        llm = get_routing_llm()
+        prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+        self.document_chain = create_stuff_documents_chain(llm, prompt)
 
-        documents = [Document(page_content=chunk) for chunk in chunks]
-        self.vectors = FAISS.from_documents(documents, embeddings)
-        self.vectors.save_local(FAISS_INDEX_PATH)
-        logging.info(f"Embeddings saved at {FAISS_INDEX_PATH}.")
+    @property
+    def ready(self) -> bool:
+        return self.vectors is not None and self.document_chain is not None
 
-        return {"status": "Vector embeddings created and saved."}
+    def warm_up(self) -> None:
+        """
+        Runs one embedding so the first user query does not pay for model initialisation.
+        """
+        if self.embeddings is not None:
+            self.embeddings.embed_query("warm up")
 
-    def retrieval(self, query: str) -> Optional[str]:
+    async def retrieval(self, query: str) -> Optional[str]:
         """
-        Retrieves the function matching the query using a retrieval chain.
+        Retrieves the function matching the query. The query is embedded once and
+        used both for the semantic routing cache and the FAISS search.
         """
         if not self.vectors:
             logging.warning("Vectors not loaded. Call vector_embedding() first.")
             return None
 
         logging.info(f"Retrieving function for query: '{query}'")
-        retriever = self.vectors.as_retriever(search_kwargs={"k": 2})
-        document_chain = create_stuff_documents_chain(llm, prompt)
-        retrieval_chain = create_retrieval_chain(retriever, document_chain)
-        response = retrieval_chain.invoke({'input': query})
-        return response.get("answer", None)
+        # Embedding is CPU-bound; run it off the event loop.
+        query_vector = await asyncio.to_thread(self.embeddings.embed_query, query)
+        cached = self.routing_cache.lookup(query, query_vector)
+        if cached is not None:
+            return json.dumps(cached)
+
+        docs = self._search_by_vectors([query_vector], RETRIEVAL_K)[0]
+        answer = await self.document_chain.ainvoke({"input": query, "context": docs})
+        self._cache_routing(query, query_vector, answer)
+        return answer
+
+    async def retrieve_many(self, queries: List[str]) -> List[Optional[str]]:
+        """
+        Retrieves functions for a batch of queries: one embedding pass, one FAISS
+        search and concurrent routing LLM calls. Answers keep the order of `queries`.
+        """
+        if not self.vectors:
+            logging.warning("Vectors not loaded. Call vector_embedding() first.")
+            return [None] * len(queries)
+        if not queries:
+            return []
+
+        logging.info(f"Retrieving functions for {len(queries)} queries")
+        query_vectors = await asyncio.to_thread(self.embeddings.embed_documents, list(queries))
+
+        results: List[Optional[str]] = [None] * len(queries)
+        pending = []
+        for i, (query, vector) in enumerate(zip(queries, query_vectors)):
+            cached = self.routing_cache.lookup(query, vector)
+            if cached is not None:
+                results[i] = json.dumps(cached)
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        contexts = self._search_by_vectors([query_vectors[i] for i in pending], RETRIEVAL_K)
+        inputs = [{"input": queries[i], "context": docs} for i, docs in zip(pending, contexts)]
+        answers = await self.document_chain.abatch(
+            inputs, config={"max_concurrency": ROUTING_MAX_CONCURRENCY}, return_exceptions=True
+        )
+
+        for i, answer in zip(pending, answers):
+            if isinstance(answer, Exception):
+                logging.error(f"Routing failed for query '{queries[i]}': {answer}")
+                continue
+            self._cache_routing(queries[i], query_vectors[i], answer)
+            results[i] = answer
+        return results
+
+    def _cache_routing(self, query: str, query_vector: List[float], answer: Optional[str]) -> None:
+        """
+        Stores a parseable routing answer in the semantic routing cache.
+        """
+        parsed = parse_json_response(answer) if answer else None
+        if parsed:
+            self.routing_cache.store(query, query_vector, extract_function_details(parsed))
+
+    def _search_by_vectors(self, query_vectors: List[List[float]], k: int) -> List[List[Any]]:
+        """
+        Runs a single FAISS search for all query vectors and maps hits back to documents.
+        """
+        matrix = np.asarray(query_vectors, dtype=np.float32)
+        _, indices = self.vectors.index.search(matrix, k)
+
+        contexts = []
+        for row in indices:
+            docs = []
+            for i in row:
+                if i == -1:
+                    continue
+                doc = self.vectors.docstore.search(self.vectors.index_to_docstore_id[i])
+                # The docstore returns an error string for unknown ids.
+                if not isinstance(doc, str):
+                    docs.append(doc)
+            contexts.append(docs)
+        return contexts
 
 # -------------------------
 # Utility Functions
@@ -149,7 +229,24 @@ def call_function_by_name(function_name: str, parameters: Dict[str, Any]) -> Any
         logging.error(f"Error calling function '{function_name}': {e}")
         return None
 
+async def call_function_by_name_async(function_name: str, parameters: Dict[str, Any]) -> Any:
+    """
+    Async counterpart of call_function_by_name; awaits the "<name>_async" API function.
+    """
+    try:
+        func = globals().get(f"{function_name}_async")
+        if not callable(func):
+            raise ValueError(f"Function '{function_name}' is not defined or not callable.")
+        return await func(**parameters)
+    except Exception as e:
+        logging.error(f"Error calling function '{function_name}': {e}")
+        return None
+
 from api_function import get_delivery_companies,get_renter_companies, get_vehicle_list,get_equipment_list,get_booking_list,get_user_profile_details,get_payment_list,get_usr_favourite_list
+from api_function import (
+    get_delivery_companies_async, get_renter_companies_async, get_vehicle_list_async, get_equipment_list_async,
+    get_booking_list_async, get_user_profile_details_async, get_payment_list_async, get_usr_favourite_list_async
+)
 
 # -------------------------
 # Example Usage
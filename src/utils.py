@@ -1,13 +1,20 @@
 import json
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, AsyncIterator
 from fastapi import HTTPException
-from context import process_full_api_response
-from retrever import (
-    get_vehicle_list, get_equipment_list,
-    get_delivery_companies, get_renter_companies,get_payment_list,get_usr_favourite_list
+from context import process_full_api_response, stream_full_api_response
+from api_function import (
+    get_payment_list_async,
+    get_usr_favourite_list_async,
+    get_booking_list_async,
+    get_delivery_companies_async,
+    get_renter_companies_async,
+    fetch_all_async
 )
 import re
 from dateutil import parser as date_parser
+from request_scope import call
+from catalog_cache import get_companies, get_company_assets
+from name_index import index_for, company_names, vehicle_names, equipment_names
 
 def get_delivery_company_names(full_response):
     if not full_response:
@@ -21,80 +28,66 @@ def get_rental_company_names(full_response):
     item_list = full_response.get("data", {}).get("itemList", [])
     return [company['name'] for company in item_list]
 
-# Cache for company data to avoid repeated API calls
-_delivery_companies_cache = None
-_rental_companies_cache = None
-_delivery_company_names_cache = None
-_rental_company_names_cache = None
+async def get_cached_delivery_companies():
+    """Get delivery companies and their names from the catalog cache."""
+    companies = await get_companies("delivery")
+    return companies, get_delivery_company_names(companies)
 
-def get_cached_delivery_companies():
-    """Get delivery companies with caching to avoid repeated API calls."""
-    global _delivery_companies_cache, _delivery_company_names_cache
-    
-    if _delivery_companies_cache is None:
-        try:
-            _delivery_companies_cache = get_delivery_companies(page=1, per_page=100)
-            _delivery_company_names_cache = get_delivery_company_names(_delivery_companies_cache)
-        except Exception as e:
-            print(f"Error fetching delivery companies: {e}")
-            _delivery_companies_cache = None
-            _delivery_company_names_cache = []
-    
-    return _delivery_companies_cache, _delivery_company_names_cache
-
-def get_cached_rental_companies():
-    """Get rental companies with caching to avoid repeated API calls."""
-    global _rental_companies_cache, _rental_company_names_cache
-    
-    if _rental_companies_cache is None:
-        try:
-            _rental_companies_cache = get_renter_companies(page=1, per_page=100)
-            _rental_company_names_cache = get_rental_company_names(_rental_companies_cache)
-        except Exception as e:
-            print(f"Error fetching rental companies: {e}")
-            _rental_companies_cache = None
-            _rental_company_names_cache = []
-    
-    return _rental_companies_cache, _rental_company_names_cache
+async def get_cached_rental_companies():
+    """Get rental companies and their names from the catalog cache."""
+    companies = await get_companies("renter")
+    return companies, get_rental_company_names(companies)
 
-def generate_llm_response(response_data: Dict, query: str) -> str:
+async def generate_llm_response(response_data: Dict, query: str) -> str:
     """Generate response using Groq LLM."""
     try:
         response_text = json.dumps(response_data, indent=3)
-        return process_full_api_response(response_text, query=query)
+        return await process_full_api_response(response_text, query=query)
     except Exception as e:
         return f"Error generating response: {str(e)}"
 
-def find_company_by_name(company_list: List[Dict], company_name: str) -> Optional[str]:
-    """Find company ID by name in the company list."""
-    search_name_lower = company_name.lower()
-    for company in company_list:
-        company_name_lower = company.get("name", "").lower()
-        if search_name_lower == company_name_lower or search_name_lower in company_name_lower:
-            return company.get("_id")
-    return None
-
-def get_company_list(function_name: str, company_name: str) -> Tuple[List[Dict], str]:
-    """Get company list based on function type."""
-    if function_name == "get_vehicle_list":
-        companies = get_delivery_companies(
-            page=1,
-            per_page=10,
-            search=company_name,
-            cat_id=None,
-            type=None,
-            sizeTypetype=None
-        )
-    else:  # get_equipment_list
-        companies = get_renter_companies(
-            role="renter",
-            search=company_name,
-            page=1,
-            per_page=10
+def stream_llm_response(response_data: Dict, query: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Stream the Groq LLM answer as (event, data) pairs."""
+    response_text = json.dumps(response_data, indent=3)
+    return stream_full_api_response(response_text, query=query)
+
+def require_upstream(response: Optional[Dict[str, Any]], what: str) -> Dict[str, Any]:
+    """Raise 503 when the upstream call for `what` returned nothing, instead of answering from null."""
+    if response is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"{what} is unavailable right now; the Fliz API did not respond. Please try again shortly."
         )
-    
-    company_list = companies.get("data", {}).get("itemList", [])
-    return company_list, "delivery" if function_name == "get_vehicle_list" else "renter"
+    return response
+
+# Handlers are split into a fetch step, which calls the upstream API and returns
+# {"api_called": ..., "response": <payload>, ...}, and an answer step, so the
+# streaming endpoint can report each stage as it completes.
+def fetch_metadata(fetched: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything in a fetch result except the upstream payload."""
+    return {key: value for key, value in fetched.items() if key != "response"}
+
+async def generate_answer(fetched: Dict[str, Any], query: str) -> Dict[str, Any]:
+    """Answer a fetch result with the LLM. Fetch results without a payload are errors and returned as they are."""
+    if "response" not in fetched:
+        return fetched
+    result = fetch_metadata(fetched)
+    result["generated_response"] = await generate_llm_response(fetched["response"], query)
+    print("generated_response :", result["generated_response"])
+    return result
+
+def find_company_by_name(company_list: List[Dict], company_name: str) -> Optional[str]:
+    """Find company ID by name in the company list, tolerating typos and matching Arabic names."""
+    matches = index_for(company_list, company_names).search(company_name, limit=3)
+    print("company matches :", [(company.get("name"), score) for company, score in matches])
+    return matches[0][0].get("_id") if matches else None
+
+async def get_company_list(function_name: str) -> Tuple[List[Dict], str]:
+    """Get the company list for the function type from the catalog cache."""
+    role = "delivery" if function_name == "get_vehicle_list" else "renter"
+    companies = await get_companies(role)
+    company_list = require_upstream(companies, "The company list").get("data", {}).get("itemList", [])
+    return company_list, role
 
 def extract_entity_details(query: str, entity_type: str) -> Tuple[Optional[str], Optional[str]]:
     """Extract company name and entity type from query."""
@@ -123,52 +116,47 @@ def extract_entity_details(query: str, entity_type: str) -> Tuple[Optional[str],
 
 def find_entity_by_type(entity_list: List[Dict], entity_type: str, is_vehicle: bool) -> Optional[str]:
     """Find entity ID by type in the entity list."""
-    for entity in entity_list:
-        details = entity.get("vehicleDetails" if is_vehicle else "equipmentDetails", {})
-        if details:
-            name_field = "sizeType" if is_vehicle else "equipmentName"
-            if entity_type.lower() in details.get(name_field, "").lower():
-                return details.get("_id")
-    return None
-
-def handle_company_based_query(function_name: str, company_name: str, query: str) -> Dict[str, Any]:
+    details_key = "vehicleDetails" if is_vehicle else "equipmentDetails"
+    entity = index_for(entity_list, vehicle_names if is_vehicle else equipment_names).best(entity_type)
+    return entity.get(details_key, {}).get("_id") if entity else None
+
+async def handle_company_based_query(function_name: str, company_name: str, query: str) -> Dict[str, Any]:
     """Handle queries that require company lookup."""
-    company_list, company_type = get_company_list(function_name, company_name)
+    return await generate_answer(await fetch_company_based_query(function_name, company_name), query)
+
+async def fetch_company_based_query(function_name: str, company_name: str) -> Dict[str, Any]:
+    """Fetch the vehicle or equipment list of a company looked up by name."""
+    company_list, company_type = await call(get_company_list, function_name)
     print("company_list :", "success" if company_list else "failed")
     
     company_id = find_company_by_name(company_list, company_name)
     print("company_id :", company_id)
 
     if not company_id:
-        if function_name == "get_vehicle_list":
-            _, available_companies = get_cached_delivery_companies()
-        else:  # get_equipment_list
-            _, available_companies = get_cached_rental_companies()
-
-        available_str = ", ".join(available_companies)
+        # The names come from the list just searched; no second catalog read.
+        available_str = ", ".join(company.get("name", "") for company in company_list)
         raise HTTPException(
             status_code=404,
             detail=f"Company '{company_name}' not found. Available companies: {available_str}"
         )
 
     # Get entity list based on function type
-    if function_name == "get_vehicle_list":
-        response = get_vehicle_list(company_id)
-        print("response of company id {}:".format(company_id), "success" if response else "failed")
-    else:
-        response = get_equipment_list(company_id)
-        print("response of company id {}:".format(company_id), "success" if response else "failed")
+    response = await call(get_company_assets, company_type, company_id)
+    print("response of company id {}:".format(company_id), "success" if response else "failed")
+    require_upstream(response, f"The asset list of '{company_name}'")
 
-    generated_response = generate_llm_response(response, query)
-    print("generated_response :", generated_response)
     return {
         "api_called": function_name,
-        "generated_response": generated_response
+        "response": response
     }
 
 
-def handle_vehicle_details(query: str) -> Dict[str, Any]:
+async def handle_vehicle_details(query: str) -> Dict[str, Any]:
     """Handle vehicle details queries."""
+    return await generate_answer(await fetch_vehicle_details(query), query)
+
+async def fetch_vehicle_details(query: str) -> Dict[str, Any]:
+    """Fetch the details of the vehicle type and company named in the query."""
     vehicle_type, company_name = extract_entity_details(query, "vehicle")
     
     if not company_name or not vehicle_type:
@@ -177,7 +165,7 @@ def handle_vehicle_details(query: str) -> Dict[str, Any]:
             detail="Could not extract company name and vehicle type from query. Please use format: 'show vehicle details of [vehicle type] of/from/in [company name]'"
         )
 
-    company_list, _ = get_company_list("get_vehicle_list", company_name)
+    company_list, _ = await call(get_company_list, "get_vehicle_list")
     company_id = find_company_by_name(company_list, company_name)
     print("company_id :", company_id)
     if not company_id:
@@ -187,7 +175,7 @@ def handle_vehicle_details(query: str) -> Dict[str, Any]:
             detail=f"Company '{company_name}' not found. Available companies: {available_companies}"
         )
 
-    vehicle_list_response = get_vehicle_list(company_id)
+    vehicle_list_response = require_upstream(await call(get_company_assets, "delivery", company_id), "The vehicle list")
     vehicle_list = vehicle_list_response.get("data", {}).get("itemList", [])
     print("vehicle_listednwe : ",vehicle_list)
     vehicle_id = find_entity_by_type(vehicle_list, vehicle_type, is_vehicle=True)
@@ -198,17 +186,20 @@ def handle_vehicle_details(query: str) -> Dict[str, Any]:
             detail=f"Vehicle type '{vehicle_type}' not found in company '{company_name}'."
         )
 
-    from api_function import get_vehicle_details
-    response = get_vehicle_details(vehicle_id)
-    generated_response = generate_llm_response(response, query)
+    from api_function import get_vehicle_details_async
+    response = require_upstream(await call(get_vehicle_details_async, vehicle_id), "The vehicle details")
     
     return {
         "api_called": "get_vehicle_details",
-        "generated_response": generated_response
+        "response": response
     }
 
-def handle_equipment_details(query: str) -> Dict[str, Any]:
+async def handle_equipment_details(query: str) -> Dict[str, Any]:
     """Handle equipment details queries."""
+    return await generate_answer(await fetch_equipment_details(query), query)
+
+async def fetch_equipment_details(query: str) -> Dict[str, Any]:
+    """Fetch the details of the equipment type and company named in the query."""
     equipment_type, company_name = extract_entity_details(query, "equipment")
     
     if not company_name or not equipment_type:
@@ -217,7 +208,7 @@ def handle_equipment_details(query: str) -> Dict[str, Any]:
             detail="Could not extract company name and equipment type from query. Please use format: 'show equipment details of [equipment type] of/from/in [company name]'"
         )
 
-    company_list, _ = get_company_list("get_equipment_list", company_name)
+    company_list, _ = await call(get_company_list, "get_equipment_list")
     company_id = find_company_by_name(company_list, company_name)
     print("company_id :", company_id)
     if not company_id:
@@ -227,7 +218,7 @@ def handle_equipment_details(query: str) -> Dict[str, Any]:
             detail=f"Company '{company_name}' not found. Available companies: {available_companies}"
         )
 
-    equipment_list_response = get_equipment_list(company_id)
+    equipment_list_response = require_upstream(await call(get_company_assets, "renter", company_id), "The equipment list")
     equipment_list = equipment_list_response.get("data", {}).get("itemList", [])
     equipment_id = find_entity_by_type(equipment_list, equipment_type, is_vehicle=False)
     print("equipment_id :", equipment_id)
@@ -238,13 +229,12 @@ def handle_equipment_details(query: str) -> Dict[str, Any]:
             detail=f"Equipment '{equipment_type}' not found in company '{company_name}'. Available equipment: {available_equipment}"
         )
 
-    from api_function import get_equipment_details
-    response = get_equipment_details(equipment_id)
-    generated_response = generate_llm_response(response, query)
+    from api_function import get_equipment_details_async
+    response = require_upstream(await call(get_equipment_details_async, equipment_id), "The equipment details")
     
     return {
         "api_called": "get_equipment_details",
-        "generated_response": generated_response
+        "response": response
     }
 
 def filter_essential_order_info(data):
@@ -288,30 +278,50 @@ def filter_company_info(data):
         summary["items"].append(filtered)
     return summary
 
-def handle_generic_query(function_name: str, parameters: Dict, query: str) -> Dict[str, Any]:
+async def handle_generic_query(function_name: str, parameters: Dict, query: str) -> Dict[str, Any]:
     """Handle generic function calls."""
-    from retrever import call_function_by_name
-    response = call_function_by_name(function_name, parameters)
+    return await generate_answer(await fetch_generic_query(function_name, parameters), query)
+
+# Routed list functions answered with every page rather than the page in the parameters.
+PAGINATED_FUNCTIONS = {
+    "get_booking_list": get_booking_list_async,
+    "get_delivery_companies": get_delivery_companies_async,
+    "get_renter_companies": get_renter_companies_async,
+}
+
+async def fetch_generic_query(function_name: str, parameters: Dict) -> Dict[str, Any]:
+    """Call the routed function, keeping only the essential fields of list responses."""
+    from retrever import call_function_by_name_async
+    if function_name in PAGINATED_FUNCTIONS:
+        filters = {key: value for key, value in parameters.items() if key not in ("page", "per_page")}
+        try:
+            # None when any page failed, so a partial list is reported as unavailable.
+            response = await fetch_all_async(PAGINATED_FUNCTIONS[function_name], **filters)
+        except TypeError as e:
+            print(f"Error calling function '{function_name}': {e}")
+            response = None
+    else:
+        response = await call_function_by_name_async(function_name, parameters)
     print("response :", "success" if response else "failed")
+    require_upstream(response, f"The result of {function_name}")
     # Filter and print the filtered result for company list functions
     if function_name in ["get_booking_list"]:
-        filtered = filter_essential_order_info(response)
-        print("filtered_response_keys :", filtered)
-        generated_response = generate_llm_response(filtered, query)
+        response = filter_essential_order_info(response)
+        print("filtered_response_keys :", response)
     elif function_name in ["get_renter_companies", "get_delivery_companies"]:
-        filtered = filter_company_info(response)
-        print("filtered_response_keys :", filtered)
-        generated_response = generate_llm_response(filtered, query)
-    else:
-        generated_response = generate_llm_response(response, query)
-    print("generated_response :", generated_response)
+        response = filter_company_info(response)
+        print("filtered_response_keys :", response)
     return {
         "api_called": function_name,
-        "generated_response": generated_response
+        "response": response
     }
 
-def handle_payment_query(query: str) -> dict:
+async def handle_payment_query(query: str) -> dict:
     """Handle payment list queries with a date in natural language, or all dates if no date is given. Supports pagination."""
+    return await generate_answer(await fetch_payment_query(query), query)
+
+async def fetch_payment_query(query: str) -> dict:
+    """Fetch the payment list for the date and page in the query."""
     # Try to extract a date from the query
     date_match = re.search(r'(\d{1,2} \w+ \d{4})', query)
     # Extract pagination if present
@@ -319,50 +329,58 @@ def handle_payment_query(query: str) -> dict:
     per_page_match = re.search(r'per[_\s]?page\s*(\d+)', query, re.IGNORECASE)
     page = int(page_match.group(1)) if page_match else 1
     per_page = int(per_page_match.group(1)) if per_page_match else 10
+    # Without an explicit page every page is fetched; None if any of them failed.
+    paginated = bool(page_match or per_page_match)
+
+    async def payment_list(start_date, end_date):
+        if paginated:
+            return await get_payment_list_async(page=page, per_page=per_page, start_date=start_date, end_date=end_date)
+        return await fetch_all_async(get_payment_list_async, start_date=start_date, end_date=end_date)
 
     if date_match:
         date_str = date_match.group(1)
         try:
             date_obj = date_parser.parse(date_str)
             date_formatted = date_obj.strftime("%Y-%m-%d")
-            payments = get_payment_list(page=page, per_page=per_page, start_date=date_formatted, end_date=date_formatted)
-            generated_response = generate_llm_response(payments, query)
-            return {
-                "api_called": "get_payment_list",
-                "date": date_formatted,
-                "page": page,
-                "per_page": per_page,
-                "generated_response": generated_response
-            }
         except Exception as e:
             return {"error": f"Could not parse date: {str(e)}"}
+        payments = await payment_list(date_formatted, date_formatted)
+        return {
+            "api_called": "get_payment_list",
+            "date": date_formatted,
+            "page": page if paginated else "all",
+            "per_page": per_page if paginated else "all",
+            "response": require_upstream(payments, "The payment list")
+        }
     else:
         # No date found, fetch all payments
-        payments = get_payment_list(page=page, per_page=per_page, start_date="", end_date="")
-        generated_response = generate_llm_response(payments, query)
+        payments = await payment_list("", "")
         return {
             "api_called": "get_payment_list",
             "date": "all",
-            "page": page,
-            "per_page": per_page,
-            "generated_response": generated_response
+            "page": page if paginated else "all",
+            "per_page": per_page if paginated else "all",
+            "response": require_upstream(payments, "The payment list")
         }
-def handle_favourite_query(query: str) -> dict:
+async def handle_favourite_query(query: str) -> dict:
     """Handle favourite list queries for company, vehicle, or equipment."""
+    return await generate_answer(await fetch_favourite_query(query), query)
+
+async def fetch_favourite_query(query: str) -> dict:
+    """Fetch the favourite list of the type named in the query."""
     import re
     # Extract type from query
     type_match = re.search(r"favou?rite (company|vehicle|equipment)", query, re.IGNORECASE)
     type_ = type_match.group(1).lower() if type_match else "company"
     page = 1
     per_page = 10
-    response = get_usr_favourite_list(type=type_, page=page, per_page=per_page)
-    generated_response = generate_llm_response(response, query)
+    response = await get_usr_favourite_list_async(type=type_, page=page, per_page=per_page)
     return {
         "api_called": "get_usr_favourite_list",
         "type": type_,
         "page": page,
         "per_page": per_page,
-        "generated_response": generated_response
+        "response": require_upstream(response, "The favourite list")
     }
 
 def format_all_companies_bullet_list(full_response):
@@ -1,10 +1,21 @@
-from typing import Dict, Any
+import asyncio
+import logging
+import threading
+from functools import partial
+from typing import Dict, Any, Tuple, Callable, AsyncIterator, Awaitable
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import json
 from utils2 import handle_company_asset_query
 from userutils import call_user_function,call_payment_list_fun
-from context2 import process_full_api_response
+from context2 import process_full_api_response, stream_full_api_response
+from http_client2 import close_async_http_client, get_response_cache, get_circuit_breakers
+from request_scope2 import request_scope
+from catalog_cache2 import get_catalog_cache
+from catalog_store import get_catalog_store, run_catalog_sync, CATALOG_SYNC_INTERVAL
+from asset_index import search_assets_across_companies, refresh_asset_index
+from company_facets import search_companies_by_facets
 # === Initialize FastAPI app ===
 app = FastAPI()
 
@@ -18,18 +29,58 @@ from retrvr2 import (
 )
 
 # === Initialize retriever ===
+# The index and embedding model load in a background thread so the process is
+# live immediately; /ready reports when queries can be served.
 retriever = FunctionRetriever("/Users/abhishek/Desktop/flizChatBot/src2/function2.txt")
-retriever.vector_embedding()
+startup_state = {"error": None}
+background_tasks = set()
 
-def generate_llm_response(response_data: Dict, query: str) -> Dict[str, Any]:
+def warm_up_retriever() -> None:
+    try:
+        retriever.vector_embedding()
+        retriever.warm_up()
+        logging.info("Retriever is ready.")
+    except Exception as e:
+        logging.exception("Retriever warm-up failed.")
+        startup_state["error"] = str(e)
+
+@app.on_event("startup")
+def start_warm_up() -> None:
+    threading.Thread(target=warm_up_retriever, name="retriever-warm-up", daemon=True).start()
+
+@app.on_event("startup")
+async def start_catalog_sync() -> None:
+    if CATALOG_SYNC_INTERVAL > 0:
+        task = asyncio.create_task(run_catalog_sync(on_synced=refresh_asset_index))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+@app.on_event("shutdown")
+async def close_upstream_client() -> None:
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await close_async_http_client()
+
+def ensure_ready() -> None:
+    if not retriever.ready:
+        detail = startup_state["error"] or "Retriever is still loading."
+        raise HTTPException(status_code=503, detail=detail)
+
+async def generate_llm_response(response_data: Dict, query: str) -> Dict[str, Any]:
     """Generate response using Groq LLM."""
     try:
         response_text = json.dumps(response_data, indent=3)
-        llm_response = process_full_api_response(response_text, query=query)
+        llm_response = await process_full_api_response(response_text, query=query)
         return {"result": llm_response}
     except Exception as e:
         return {"error": f"Error generating response: {str(e)}"}
 
+def stream_llm_response(response_data: Any, query: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Stream the Groq LLM answer as (event, data) pairs."""
+    response_text = json.dumps(response_data, indent=3)
+    return stream_full_api_response(response_text, query=query)
+
 def parse_retriever_result(result: Any) -> Dict[str, Any]:
     if not result:
         return {"retriever_result": "No result found"}
@@ -55,11 +106,14 @@ def parse_retriever_result(result: Any) -> Dict[str, Any]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"❌ Failed to parse function data: {str(e)}")
 
-# === Route Handlers ===
-@app.post("/query")
-def handle_query(request: QueryRequest) -> Dict[str, Any]:
-    query = request.query
-    result = retriever.retrieval(query)
+# === Routing ===
+async def resolve_fetch(query: str) -> Tuple[Dict[str, Any], Callable[[], Awaitable[Any]]]:
+    """
+    Routes the query to a function and returns its routing details with the
+    upstream fetch that serves it.
+    """
+    ensure_ready()
+    result = await retriever.retrieval(query)
 
     # Parse retriever result
     parsed_output = parse_retriever_result(result)
@@ -70,37 +124,117 @@ def handle_query(request: QueryRequest) -> Dict[str, Any]:
     parameters = parsed_output.get("parameters", {})
 
     if function_name == "handle_company_asset_query":
-        # Print each parameter one by one (explicitly if known)
         company_type = parameters.get("company_type")
         company_name = parameters.get("company_name")
         asset_name = parameters.get("asset_name")
-        output = handle_company_asset_query(company_type, company_name, asset_name)
-        return generate_llm_response(output,query)
-        # return output
+        return parsed_output, partial(handle_company_asset_query, company_type, company_name, asset_name)
     elif function_name == "call_user_function":
         fun_name = parameters.get("function_name")
         arguments = parameters.get("arg")
-        output = call_user_function(fun_name, arguments)
-        # Ensure output is a dictionary
-        print(output)
-        if not isinstance(output, dict):
-            return {"result": generate_llm_response(output, query)}
-        return generate_llm_response(output, query)
-        # return output
+        return parsed_output, partial(call_user_function, fun_name, arguments)
     elif function_name == "call_payment_list_fun":
         start_date = parameters.get("start_date")
         end_date = parameters.get("end_date")
-        output = call_payment_list_fun(start_date, end_date)
-
-        # Ensure output is a dictionary
-        if not isinstance(output, dict):
-            return {"result": generate_llm_response(output, query)}
-        return generate_llm_response(output, query)
-
+        return parsed_output, partial(call_payment_list_fun, start_date, end_date)
+    elif function_name == "search_assets_across_companies":
+        return parsed_output, partial(
+            search_assets_across_companies,
+            parameters.get("asset_name"),
+            parameters.get("company_type"),
+            parameters.get("min_price"),
+            parameters.get("max_price"),
+            parameters.get("min_available"),
+        )
+    elif function_name == "search_companies_by_facets":
+        return parsed_output, partial(
+            search_companies_by_facets,
+            parameters.get("company_type"),
+            parameters.get("city"),
+            parameters.get("category"),
+            parameters.get("min_rating"),
+        )
     else:
         raise HTTPException(status_code=400, detail=f"Unsupported function: {function_name}")
 
-# === Health Check Route ===
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_query(query: str) -> AsyncIterator[str]:
+    """
+    Runs the query pipeline as server-sent events: "routed", "fetched", an optional
+    "summarizing", one "token" per answer fragment and a final "done" carrying the
+    same body as /query. Failures after the stream has started become an "error" event.
+    """
+    try:
+        parsed_output, fetch = await resolve_fetch(query)
+        yield format_sse("routed", parsed_output)
+
+        async with request_scope():
+            output = await fetch()
+        yield format_sse("fetched", {"function_name": parsed_output.get("function_name")})
+
+        answer = []
+        async for event, data in stream_llm_response(output, query):
+            if event == "token":
+                answer.append(data["text"])
+            yield format_sse(event, data)
+        yield format_sse("done", {"result": "".join(answer)})
+    except HTTPException as e:
+        yield format_sse("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logging.exception(f"Streaming query failed: '{query}'")
+        yield format_sse("error", {"status_code": 500, "detail": str(e)})
+
+# === Route Handlers ===
+@app.post("/query")
+async def handle_query(request: QueryRequest) -> Dict[str, Any]:
+    query = request.query
+    parsed_output, fetch = await resolve_fetch(query)
+    async with request_scope():
+        output = await fetch()
+    print(output)
+
+    # Ensure output is a dictionary
+    if parsed_output.get("function_name") != "handle_company_asset_query" and not isinstance(output, dict):
+        return {"result": await generate_llm_response(output, query)}
+    return await generate_llm_response(output, query)
+
+@app.post("/query/stream")
+async def handle_query_stream(request: QueryRequest) -> StreamingResponse:
+    # Readiness is checked up front so a loading server still answers 503.
+    ensure_ready()
+    return StreamingResponse(
+        stream_query(request.query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/stats/routing-cache")
+async def routing_cache_stats() -> Dict[str, Any]:
+    return retriever.routing_cache.stats()
+
+@app.get("/stats/upstream-cache")
+async def upstream_cache_stats() -> Dict[str, Any]:
+    return get_response_cache().stats()
+
+@app.get("/stats/upstream-circuits")
+async def upstream_circuit_stats() -> Dict[str, Any]:
+    return get_circuit_breakers().stats()
+
+@app.get("/stats/catalog-cache")
+async def catalog_cache_stats() -> Dict[str, Any]:
+    return get_catalog_cache().stats()
+
+@app.get("/stats/catalog-snapshot")
+async def catalog_snapshot_stats() -> Dict[str, Any]:
+    return await asyncio.to_thread(get_catalog_store().stats)
+
+# === Health Check Routes ===
 @app.get("/health")
-def health_check() -> Dict[str, str]:
+async def health_check() -> Dict[str, str]:
     return {"status": "ok", "message": "App is running!"}
+
+@app.get("/ready")
+async def readiness_check() -> Dict[str, str]:
+    ensure_ready()
+    return {"status": "ready"}
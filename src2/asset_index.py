@@ -0,0 +1,210 @@
+"""
+Global index of every vehicle and equipment across companies, built from the
+catalog snapshot, for "which companies have X under Y per day" queries.
+
+Assets are grouped by normalized name, and the distinct names are matched with
+the trigram name index, so a name query resolves to whole groups however many
+companies list the asset. Price per day and available quantity are kept as
+sorted columns and range filters are bisected out of them and intersected, so a
+query touches no upstream endpoint and no asset outside its result. The index is
+rebuilt after each snapshot sync, and on use when the snapshot has changed.
+"""
+import os
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+
+from catalog_store import get_catalog_store
+from name_index2 import NameIndex, normalize_name
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+# Assets returned by a global asset search; the total count is reported as well.
+ASSET_SEARCH_LIMIT = int(os.getenv("ASSET_SEARCH_LIMIT", "20"))
+
+# role -> (details key, name field, price per day field, available quantity field)
+ASSET_FIELDS = {
+    "delivery": ("vehicleDetails", "sizeType", "priceInside_city_perDay", "available_trucks"),
+    "renter": ("equipmentDetails", "equipmentName", "equipmentPrice_perDay", "available_equipments"),
+}
+COMPANY_ROLES = {"get_delivery_companies": "delivery", "get_renter_companies": "renter"}
+# Words in other company_type values that name a role, e.g. "renter" or "vehicles".
+ROLE_WORDS = {"delivery": "delivery", "vehicle": "delivery", "renter": "renter", "equipment": "renter"}
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def asset_record(role: str, company_id: str, company_name: str, city: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The fields of an asset list item that a global search filters on and returns.
+    """
+    details_key, name_key, price_key, available_key = ASSET_FIELDS[role]
+    details = item.get(details_key) or {}
+    return {
+        "role": role,
+        "company_id": company_id,
+        "company_name": company_name,
+        "city": item.get("city") or city,
+        "asset_id": details.get("_id"),
+        "asset_name": details.get(name_key),
+        "ar_asset_name": details.get(f"ar_{name_key}"),
+        "price_per_day": _number(details.get(price_key)),
+        "available_quantity": _number(details.get(available_key)),
+    }
+
+
+# -------------------------
+# Sorted Column
+# -------------------------
+class SortedColumn:
+    """
+    Asset positions ordered by one numeric field; assets without a value are left out.
+    """
+
+    def __init__(self, values: List[Optional[float]]):
+        pairs = sorted((value, position) for position, value in enumerate(values) if value is not None)
+        self._values = [value for value, _ in pairs]
+        self._positions = [position for _, position in pairs]
+
+    def between(self, low: Optional[float], high: Optional[float]) -> Set[int]:
+        start = bisect_left(self._values, low) if low is not None else 0
+        end = bisect_right(self._values, high) if high is not None else len(self._values)
+        return set(self._positions[start:end])
+
+
+# -------------------------
+# Index
+# -------------------------
+class AssetIndex:
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+        self._roles: Dict[str, Set[int]] = {}
+        groups: Dict[str, List[int]] = {}
+        for position, record in enumerate(records):
+            self._roles.setdefault(record["role"], set()).add(position)
+            for name in (record["asset_name"], record["ar_asset_name"]):
+                key = normalize_name(name or "")
+                if key:
+                    groups.setdefault(key, []).append(position)
+        self._groups = groups
+        self._names = NameIndex((key, [key]) for key in groups)
+        self._price = SortedColumn([record["price_per_day"] for record in records])
+        self._available = SortedColumn([record["available_quantity"] for record in records])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def search(self, asset_name: Optional[str] = None, role: Optional[str] = None,
+               min_price: Optional[float] = None, max_price: Optional[float] = None,
+               min_available: Optional[float] = None, limit: int = ASSET_SEARCH_LIMIT) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Returns the number of matching assets and up to `limit` of them, best name
+        match first and cheapest first within a name.
+        """
+        filters: List[Set[int]] = []
+        if role is not None:
+            filters.append(self._roles.get(role, set()))
+        if min_price is not None or max_price is not None:
+            filters.append(self._price.between(min_price, max_price))
+        if min_available is not None:
+            filters.append(self._available.between(min_available, None))
+
+        scores: Dict[int, float] = {}
+        if asset_name:
+            for key, score in self._names.search(asset_name, limit=len(self._groups) or 1):
+                for position in self._groups[key]:
+                    scores.setdefault(position, score)
+            filters.append(set(scores))
+
+        if filters:
+            filters.sort(key=len)
+            matched = set.intersection(*filters)
+        else:
+            matched = set(range(len(self.records)))
+
+        def rank(position: int):
+            price = self.records[position]["price_per_day"]
+            return (-scores.get(position, 0.0), price is None, price or 0.0, position)
+
+        top = sorted(matched, key=rank)[:limit]
+        return len(matched), [self.records[position] for position in top]
+
+
+# -------------------------
+# Maintenance
+# -------------------------
+_state: Dict[str, Any] = {"index": None, "version": None}
+_rebuild_lock: Optional[asyncio.Lock] = None
+
+
+def build_asset_index() -> Tuple[AssetIndex, int]:
+    store = get_catalog_store()
+    version = store.data_version()
+    records = [asset_record(*row) for row in store.asset_rows()]
+    return AssetIndex(records), version
+
+
+async def refresh_asset_index(force: bool = True) -> AssetIndex:
+    """
+    Rebuilds the index from the snapshot in a worker thread. Without `force` the
+    current index is kept while the snapshot has not changed since it was built.
+    """
+    global _rebuild_lock
+    if _rebuild_lock is None:
+        _rebuild_lock = asyncio.Lock()
+    async with _rebuild_lock:
+        store = get_catalog_store()
+        if not force and _state["index"] is not None:
+            if await asyncio.to_thread(store.data_version) == _state["version"]:
+                return _state["index"]
+        index, version = await asyncio.to_thread(build_asset_index)
+        _state["index"], _state["version"] = index, version
+        logging.info(f"Global asset index rebuilt with {len(index)} assets.")
+        return index
+
+
+async def get_asset_index() -> AssetIndex:
+    return await refresh_asset_index(force=False)
+
+
+async def search_assets_across_companies(asset_name: Optional[str] = None, company_type: Optional[str] = None,
+                                         min_price: Any = None, max_price: Any = None,
+                                         min_available: Any = None) -> Dict[str, Any]:
+    """
+    Every vehicle or equipment across companies matching the name and the price
+    and availability ranges, as {"totalCount", "assets"}.
+    """
+    role = _role(company_type)
+    if company_type and role is None:
+        # Searching every role instead would answer a vehicle question with equipment.
+        return {"totalCount": 0, "assets": [], "unmatched": {"company_type": company_type}}
+    index = await get_asset_index()
+    if not len(index):
+        return {"error": "❌ The asset catalog has not been synced yet. Please try again shortly."}
+    total, assets = index.search(
+        asset_name=asset_name,
+        role=role,
+        min_price=_number(min_price),
+        max_price=_number(max_price),
+        min_available=_number(min_available),
+    )
+    return {"totalCount": total, "assets": assets}
+
+
+def _role(company_type: Optional[str]) -> Optional[str]:
+    if not company_type:
+        return None
+    if company_type in COMPANY_ROLES:
+        return COMPANY_ROLES[company_type]
+    text = str(company_type).lower()
+    return next((role for word, role in ROLE_WORDS.items() if word in text), None)
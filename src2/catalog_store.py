@@ -0,0 +1,452 @@
+"""
+Local SQLite snapshot of the Fliz catalog: delivery and renter companies with
+their vehicle and equipment lists, plus FTS5 indexes over their names.
+
+A background job, run by one process per database (the sync leader), walks the paginated company lists page by page, upserting each
+page as it arrives, and re-fetches a company's asset list only when the company
+record changed or the list is older than CATALOG_ASSET_REFRESH. Lookups are
+answered from the snapshot while it is younger than CATALOG_SNAPSHOT_MAX_AGE and
+return None otherwise, so callers fall back to the upstream API.
+
+Usage:
+    python catalog_store.py          # sync once and print the snapshot stats
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: set CATALOG_SYNC_LEADER in exactly one process.
+    fcntl = None
+
+from api_function2 import (
+    iterate_pages_async,
+    get_delivery_companies_async, get_renter_companies_async,
+    get_vehicle_list_async, get_equipment_list_async
+)
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH", "catalog.db")
+# Seconds between syncs of the company lists; 0 disables the background job.
+CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "900"))
+# Seconds after which an unchanged company's asset list is fetched again.
+CATALOG_ASSET_REFRESH = float(os.getenv("CATALOG_ASSET_REFRESH", "3600"))
+# Snapshot data older than this is treated as missing.
+CATALOG_SNAPSHOT_MAX_AGE = float(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "7200"))
+CATALOG_SYNC_CONCURRENCY = int(os.getenv("CATALOG_SYNC_CONCURRENCY", "4"))
+# "auto": the worker holding the database's sync lock file syncs; "true" / "false" force it on or off.
+CATALOG_SYNC_LEADER = os.getenv("CATALOG_SYNC_LEADER", "auto").lower()
+
+COMPANY_LISTS = {
+    "delivery": get_delivery_companies_async,
+    "renter": get_renter_companies_async,
+}
+ASSET_LISTS = {
+    "delivery": get_vehicle_list_async,
+    "renter": get_equipment_list_async,
+}
+ASSET_NAME_FIELDS = {
+    "delivery": ("vehicleDetails", "sizeType"),
+    "renter": ("equipmentDetails", "equipmentName"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS company_lists (
+    role TEXT PRIMARY KEY,
+    envelope TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS companies (
+    id TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    ar_name TEXT,
+    city TEXT,
+    data TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    assets_synced_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS companies_role ON companies (role, position);
+CREATE TABLE IF NOT EXISTS asset_lists (
+    company_id TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    envelope TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assets (
+    company_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    ar_name TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_company ON assets (company_id, position);
+CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts USING fts5(
+    name, ar_name, city, content='', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS assets_fts USING fts5(
+    name, ar_name, content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _hash(item: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(item, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _envelope(payload: Dict[str, Any]) -> str:
+    """
+    Everything in the response's data except the item list, to rebuild the response.
+    """
+    data = {key: value for key, value in (payload.get("data") or {}).items() if key != "itemList"}
+    return json.dumps({**payload, "data": data})
+
+
+def _with_items(envelope: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    payload = json.loads(envelope)
+    payload["data"]["itemList"] = items
+    return payload
+
+
+def _match_query(text: str) -> Optional[str]:
+    """
+    FTS5 query that matches names containing every word of `text` as a prefix.
+    """
+    words = "".join(ch if ch.isalnum() else " " for ch in text).split()
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+# -------------------------
+# Snapshot Store
+# -------------------------
+class CatalogStore:
+    """
+    The snapshot database. Reads and writes use separate connections on a WAL
+    database, so lookups are not blocked by a running sync.
+    """
+
+    def __init__(self, path: str = CATALOG_DB_PATH):
+        self.path = path
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._reader = self._connect()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self.last_sync: Dict[str, Any] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # ---- Writes (called from worker threads by the sync job)
+    def upsert_companies(self, role: str, page: Dict[str, Any], first_position: int, synced_at: float) -> None:
+        items = (page.get("data") or {}).get("itemList") or []
+        with self._write_lock, self._writer:
+            if first_position == 0:
+                self._writer.execute(
+                    "INSERT OR REPLACE INTO company_lists (role, envelope, synced_at) VALUES (?, ?, ?)",
+                    (role, _envelope(page), synced_at),
+                )
+            for position, item in enumerate(items, start=first_position):
+                if not item.get("_id"):
+                    continue
+                self._upsert_company(role, position, item, synced_at)
+
+    def _upsert_company(self, role: str, position: int, item: Dict[str, Any], synced_at: float) -> None:
+        row = self._writer.execute("SELECT rowid, hash, name, ar_name, city FROM companies WHERE id = ?", (item["_id"],)).fetchone()
+        digest = _hash(item)
+        values = (role, position, item.get("name"), item.get("ar_name"), item.get("city"), json.dumps(item), digest, synced_at)
+        if row is None:
+            cursor = self._writer.execute(
+                "INSERT INTO companies (role, position, name, ar_name, city, data, hash, synced_at, id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values + (item["_id"],),
+            )
+            self._index_company(cursor.lastrowid, item)
+            return
+        rowid, old_hash = row[0], row[1]
+        # A changed company record invalidates its asset list.
+        self._writer.execute(
+            "UPDATE companies SET role = ?, position = ?, name = ?, ar_name = ?, city = ?, data = ?, hash = ?, "
+            "synced_at = ?, assets_synced_at = CASE WHEN hash = ? THEN assets_synced_at ELSE 0 END WHERE rowid = ?",
+            values + (digest, rowid),
+        )
+        if old_hash != digest:
+            self._writer.execute(
+                "INSERT INTO companies_fts (companies_fts, rowid, name, ar_name, city) VALUES ('delete', ?, ?, ?, ?)",
+                (rowid, row[2] or "", row[3] or "", row[4] or ""),
+            )
+            self._index_company(rowid, item)
+
+    def _index_company(self, rowid: int, item: Dict[str, Any]) -> None:
+        self._writer.execute(
+            "INSERT INTO companies_fts (rowid, name, ar_name, city) VALUES (?, ?, ?, ?)",
+            (rowid, item.get("name") or "", item.get("ar_name") or "", item.get("city") or ""),
+        )
+
+    def remove_unseen_companies(self, role: str, synced_at: float) -> int:
+        """
+        Deletes the companies of `role` that a complete sync started at `synced_at` did not see.
+        """
+        with self._write_lock, self._writer:
+            rows = self._writer.execute(
+                "SELECT rowid, id, name, ar_name, city FROM companies WHERE role = ? AND synced_at < ?", (role, synced_at)
+            ).fetchall()
+            for rowid, company_id, name, ar_name, city in rows:
+                self._writer.execute(
+                    "INSERT INTO companies_fts (companies_fts, rowid, name, ar_name, city) VALUES ('delete', ?, ?, ?, ?)",
+                    (rowid, name or "", ar_name or "", city or ""),
+                )
+                self._delete_assets(company_id)
+                self._writer.execute("DELETE FROM asset_lists WHERE company_id = ?", (company_id,))
+                self._writer.execute("DELETE FROM companies WHERE rowid = ?", (rowid,))
+            return len(rows)
+
+    def replace_assets(self, role: str, company_id: str, payload: Dict[str, Any], synced_at: float) -> None:
+        details_key, name_key = ASSET_NAME_FIELDS[role]
+        items = (payload.get("data") or {}).get("itemList") or []
+        with self._write_lock, self._writer:
+            self._delete_assets(company_id)
+            self._writer.execute(
+                "INSERT OR REPLACE INTO asset_lists (company_id, role, envelope) VALUES (?, ?, ?)",
+                (company_id, role, _envelope(payload)),
+            )
+            for position, item in enumerate(items):
+                details = item.get(details_key) or {}
+                name, ar_name = details.get(name_key) or "", details.get(f"ar_{name_key}") or ""
+                cursor = self._writer.execute(
+                    "INSERT INTO assets (company_id, role, position, name, ar_name, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    (company_id, role, position, name, ar_name, json.dumps(item)),
+                )
+                self._writer.execute(
+                    "INSERT INTO assets_fts (rowid, name, ar_name) VALUES (?, ?, ?)", (cursor.lastrowid, name, ar_name)
+                )
+            self._writer.execute("UPDATE companies SET assets_synced_at = ? WHERE id = ?", (synced_at, company_id))
+
+    def _delete_assets(self, company_id: str) -> None:
+        for rowid, name, ar_name in self._writer.execute(
+            "SELECT rowid, name, ar_name FROM assets WHERE company_id = ?", (company_id,)
+        ).fetchall():
+            self._writer.execute(
+                "INSERT INTO assets_fts (assets_fts, rowid, name, ar_name) VALUES ('delete', ?, ?, ?)",
+                (rowid, name or "", ar_name or ""),
+            )
+        self._writer.execute("DELETE FROM assets WHERE company_id = ?", (company_id,))
+
+    def companies_needing_assets(self, role: str, refresh_before: float) -> List[str]:
+        with self._write_lock:
+            rows = self._writer.execute(
+                "SELECT id FROM companies WHERE role = ? AND assets_synced_at < ? ORDER BY position",
+                (role, refresh_before),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # ---- Reads
+    def _read(self, sql: str, params=()) -> List[tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def companies_payload(self, role: str, max_age: float = CATALOG_SNAPSHOT_MAX_AGE) -> Optional[Dict[str, Any]]:
+        """
+        The company list of `role` as the upstream returns it, or None when it is
+        missing or older than max_age.
+        """
+        listed = self._read("SELECT envelope, synced_at FROM company_lists WHERE role = ?", (role,))
+        if not listed or time.time() - listed[0][1] > max_age:
+            return None
+        items = [json.loads(data) for (data,) in self._read(
+            "SELECT data FROM companies WHERE role = ? ORDER BY position", (role,))]
+        return _with_items(listed[0][0], items)
+
+    def assets_payload(self, role: str, company_id: str, max_age: float = CATALOG_SNAPSHOT_MAX_AGE) -> Optional[Dict[str, Any]]:
+        """
+        A company's vehicle or equipment list as the upstream returns it, or None.
+        """
+        listed = self._read(
+            "SELECT l.envelope, c.assets_synced_at FROM asset_lists l JOIN companies c ON c.id = l.company_id "
+            "WHERE l.company_id = ? AND l.role = ?", (company_id, role))
+        if not listed or time.time() - listed[0][1] > max_age:
+            return None
+        items = [json.loads(data) for (data,) in self._read(
+            "SELECT data FROM assets WHERE company_id = ? ORDER BY position", (company_id,))]
+        return _with_items(listed[0][0], items)
+
+    def search_companies(self, text: str, role: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Companies whose name, Arabic name or city contain every word of `text`, best first.
+        """
+        match = _match_query(text)
+        if match is None:
+            return []
+        rows = self._read(
+            "SELECT c.data FROM companies_fts f JOIN companies c ON c.rowid = f.rowid "
+            "WHERE companies_fts MATCH ? AND (? IS NULL OR c.role = ?) ORDER BY bm25(companies_fts) LIMIT ?",
+            (match, role, role, limit))
+        return [json.loads(data) for (data,) in rows]
+
+    def search_assets(self, text: str, role: Optional[str] = None, company_id: Optional[str] = None,
+                      limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Asset list items whose name contains every word of `text`, each with its company_id and role.
+        """
+        match = _match_query(text)
+        if match is None:
+            return []
+        rows = self._read(
+            "SELECT a.company_id, a.role, a.data FROM assets_fts f JOIN assets a ON a.rowid = f.rowid "
+            "WHERE assets_fts MATCH ? AND (? IS NULL OR a.role = ?) AND (? IS NULL OR a.company_id = ?) "
+            "ORDER BY bm25(assets_fts) LIMIT ?",
+            (match, role, role, company_id, company_id, limit))
+        return [{"company_id": company_id, "role": row_role, "item": json.loads(data)} for company_id, row_role, data in rows]
+
+    def asset_rows(self) -> List[tuple]:
+        """
+        (role, company_id, company name, company city, asset item) of every asset, in catalog order.
+        """
+        rows = self._read(
+            "SELECT a.role, a.company_id, c.name, c.city, a.data FROM assets a JOIN companies c ON c.id = a.company_id "
+            "ORDER BY a.role, c.position, a.position")
+        return [(role, company_id, name, city, json.loads(data)) for role, company_id, name, city, data in rows]
+
+    def data_version(self) -> int:
+        """
+        Changes whenever another connection, e.g. a sync, commits to the database.
+        """
+        return self._read("PRAGMA data_version")[0][0]
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._read("SELECT role, COUNT(*) FROM companies GROUP BY role"))
+        lists = {role: round(time.time() - synced_at) for role, synced_at in self._read(
+            "SELECT role, synced_at FROM company_lists")}
+        assets = self._read("SELECT COUNT(*) FROM assets")[0][0]
+        return {"companies": counts, "assets": assets, "list_age_seconds": lists, "last_sync": self.last_sync}
+
+
+@lru_cache(maxsize=1)
+def get_catalog_store() -> CatalogStore:
+    return CatalogStore()
+
+
+# -------------------------
+# Sync
+# -------------------------
+async def sync_catalog(store: Optional[CatalogStore] = None) -> Dict[str, Any]:
+    """
+    Walks both company lists into the snapshot, then refreshes the asset lists of
+    companies that changed or whose list is older than CATALOG_ASSET_REFRESH.
+    """
+    store = store or get_catalog_store()
+    started = time.time()
+    report: Dict[str, Any] = {"started": started}
+    for role, list_function in COMPANY_LISTS.items():
+        report[role] = await _sync_role(store, role, list_function, started)
+    report["seconds"] = round(time.time() - started, 2)
+    store.last_sync = report
+    logging.info(f"Catalog sync: {report}")
+    return report
+
+
+async def _sync_role(store: CatalogStore, role: str, list_function, started: float) -> Dict[str, Any]:
+    position = 0
+    complete = True
+    async for page in iterate_pages_async(list_function):
+        if page is None:
+            # A missing page leaves the walk incomplete: keep the companies we did not see.
+            complete = False
+            if position == 0:
+                return {"companies": 0, "complete": False}
+            continue
+        items = (page.get("data") or {}).get("itemList") or []
+        await asyncio.to_thread(store.upsert_companies, role, page, position, started)
+        position += len(items)
+    removed = await asyncio.to_thread(store.remove_unseen_companies, role, started) if complete else 0
+
+    stale = await asyncio.to_thread(store.companies_needing_assets, role, time.time() - CATALOG_ASSET_REFRESH)
+    semaphore = asyncio.Semaphore(CATALOG_SYNC_CONCURRENCY)
+
+    async def refresh(company_id: str) -> bool:
+        async with semaphore:
+            payload = await ASSET_LISTS[role](company_id)
+        if payload is None:
+            return False
+        await asyncio.to_thread(store.replace_assets, role, company_id, payload, time.time())
+        return True
+
+    refreshed = await asyncio.gather(*(refresh(company_id) for company_id in stale))
+    return {
+        "companies": position,
+        "removed": removed,
+        "complete": complete,
+        "asset_lists_refreshed": sum(refreshed),
+        "asset_lists_failed": len(refreshed) - sum(refreshed),
+    }
+
+
+_leader_lock = None
+
+
+def is_sync_leader(path: str = CATALOG_DB_PATH) -> bool:
+    """
+    True if this process syncs the snapshot. With CATALOG_SYNC_LEADER=auto the first
+    process to lock `<path>.sync.lock` keeps the lock, and the role, until it exits;
+    the others only read the snapshot.
+    """
+    global _leader_lock
+    if CATALOG_SYNC_LEADER in ("true", "false"):
+        return CATALOG_SYNC_LEADER == "true"
+    if _leader_lock is not None:
+        return True
+    if fcntl is None:
+        return False
+    lock = open(f"{path}.sync.lock", 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    _leader_lock = lock
+    logging.info(f"Process {os.getpid()} is the catalog sync leader.")
+    return True
+
+
+async def run_catalog_sync(interval: float = CATALOG_SYNC_INTERVAL, on_synced=None) -> None:
+    """
+    Syncs the snapshot every `interval` seconds until cancelled, awaiting
+    `on_synced()` after each sync. Processes that are not the sync leader check
+    again every interval, so another takes over when the leader exits.
+    """
+    while True:
+        try:
+            if not is_sync_leader():
+                await asyncio.sleep(interval)
+                continue
+            await sync_catalog()
+            if on_synced is not None:
+                await on_synced()
+        except Exception:
+            logging.exception("Catalog sync failed.")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(sync_catalog())
+    print(json.dumps(get_catalog_store().stats(), indent=2))
+    sys.exit(0)
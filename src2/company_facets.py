@@ -0,0 +1,248 @@
+"""
+Faceted index of the cached company catalog: role, city, rating and equipment category.
+
+Each facet value maps to a bitset of company positions, held in a Python int, so a
+query is a few bitwise ANDs and its size a popcount. Facet values in a query are
+matched after normalization (case, accents, Arabic variants); a city or category
+that is not in the catalog only selects a close spelling, e.g. "riyad" selects
+"Riyadh", and the substituted value is reported with the answer. The filtered
+companies are returned with their count and the counts of each city and category
+among them, so a "renters in Riyadh with category Excavators" question reaches the
+LLM as the answer set instead of the whole catalog.
+"""
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from catalog_cache2 import get_companies, get_all_category_companies
+from name_index2 import NameIndex, normalize_name, NAME_MATCH_THRESHOLD
+from filter import filter_company_info
+from utils2 import upstream_error
+
+# -------------------------
+# Constants
+# -------------------------
+# Companies returned with a faceted search; the total count is always reported.
+FACET_RESULT_LIMIT = 50
+# Facet values listed with their counts.
+FACET_COUNT_LIMIT = 10
+# Lowest name score for a city or category that is not in the catalog to stand for
+# one that is; anything looser would answer for a city the user did not ask about.
+FACET_MATCH_THRESHOLD = 0.8
+
+COMPANY_ROLES = {"get_delivery_companies": "delivery", "get_renter_companies": "renter"}
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _count(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def _positions(bits: int) -> Iterable[int]:
+    """Positions of the set bits, lowest first."""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+# -------------------------
+# Facet
+# -------------------------
+class Facet:
+    """
+    One bitset of company positions per value; values are looked up by normalized name.
+    """
+
+    def __init__(self, threshold: float = NAME_MATCH_THRESHOLD):
+        self.bits: Dict[str, int] = {}
+        self.labels: Dict[str, str] = {}
+        self.threshold = threshold
+        self._names: Optional[NameIndex] = None
+
+    def add(self, value: Any, position: int) -> None:
+        key = normalize_name(value) if isinstance(value, str) else None
+        if not key:
+            return
+        self.bits[key] = self.bits.get(key, 0) | 1 << position
+        self.labels.setdefault(key, value.strip())
+
+    def match(self, value: str) -> Optional[str]:
+        """
+        The known value equal to `value` once normalized, else the closest one scoring
+        at least the facet's threshold; None when no value matches.
+        """
+        key = normalize_name(value)
+        if key in self.bits:
+            return key
+        if self._names is None:
+            self._names = NameIndex((known, [known]) for known in self.bits)
+        return self._names.best(value, threshold=self.threshold)
+
+    def counts(self, within: int, limit: int = FACET_COUNT_LIMIT) -> Dict[str, int]:
+        counted = ((self.labels[key], _count(bits & within)) for key, bits in self.bits.items())
+        ranked = sorted((entry for entry in counted if entry[1]), key=lambda entry: -entry[1])
+        return dict(ranked[:limit])
+
+
+# -------------------------
+# Index
+# -------------------------
+class CompanyFacets:
+    def __init__(self, companies: Iterable[Tuple[str, Dict[str, Any]]], categories: Iterable[Dict[str, Any]] = ()):
+        """
+        `companies` pairs each role with a company record; `categories` are the items of
+        the category list, one per company and category.
+        """
+        self.companies: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self.roles = Facet()
+        self.cities = Facet(FACET_MATCH_THRESHOLD)
+        self.categories = Facet(FACET_MATCH_THRESHOLD)
+        self._ratings: Dict[float, int] = {}
+
+        for role, company in companies:
+            position = self._position(company)
+            self.roles.add(role, position)
+            self.cities.add(company.get("city"), position)
+            rating = _number(company.get("company_rating"))
+            if rating is not None:
+                self._ratings[rating] = self._ratings.get(rating, 0) | 1 << position
+
+        self.has_categories = False
+        for item in categories:
+            self.has_categories = True
+            position = self._position(item)
+            category = item.get("categoryDetails") or {}
+            self.categories.add(category.get("name"), position)
+            self.categories.add(category.get("ar_name"), position)
+
+        self.all = (1 << len(self.companies)) - 1
+
+    def _position(self, company: Dict[str, Any]) -> int:
+        company_id = company.get("_id")
+        position = self._positions.get(company_id) if company_id else None
+        if position is None:
+            position = len(self.companies)
+            self.companies.append({key: value for key, value in company.items() if key != "categoryDetails"})
+            if company_id:
+                self._positions[company_id] = position
+        return position
+
+    def min_rating(self, rating: float) -> int:
+        bits = 0
+        for value, rated in self._ratings.items():
+            if value >= rating:
+                bits |= rated
+        return bits
+
+    def search(self, role: Optional[str] = None, city: Optional[str] = None, category: Optional[str] = None,
+               min_rating: Optional[float] = None) -> Tuple[int, Dict[str, str], Dict[str, str]]:
+        """
+        Returns the bitset of the companies matching every given facet, the facets
+        whose value matched nothing in the catalog, and the catalog values that stood
+        in for a facet value spelled differently.
+        """
+        bits = self.all
+        unmatched, substituted = {}, {}
+        for facet, name, value in ((self.roles, "role", role), (self.cities, "city", city),
+                                   (self.categories, "category", category)):
+            if not value:
+                continue
+            key = facet.match(value)
+            if key is None:
+                unmatched[name] = value
+                bits = 0
+                continue
+            if key != normalize_name(value):
+                substituted[name] = facet.labels[key]
+            bits &= facet.bits[key]
+        if min_rating is not None:
+            bits &= self.min_rating(min_rating)
+        return bits, unmatched, substituted
+
+
+# -------------------------
+# Catalog Facets
+# -------------------------
+_state: Dict[str, Any] = {"sources": None, "facets": None}
+
+
+async def get_company_facets(with_categories: bool = False) -> Optional[CompanyFacets]:
+    """
+    The facet index of the cached catalog, rebuilt when the catalog cache replaces
+    one of its lists. None when a company list is unavailable.
+    """
+    loads = [get_companies("delivery"), get_companies("renter")]
+    if with_categories:
+        loads.append(get_all_category_companies())
+    # The three lists are independent: load them together.
+    sources = list(await asyncio.gather(*loads))
+    if any(source is None for source in sources[:2]):
+        return None
+    if not with_categories:
+        sources.append(None)
+
+    cached = _state["sources"]
+    if cached is not None and all(new is old for new, old in zip(sources[:2], cached)):
+        # A category list loaded later is added by rebuilding; otherwise keep the index.
+        if sources[2] is None or sources[2] is cached[2]:
+            return _state["facets"]
+
+    delivery, renter, categories = sources
+    facets = CompanyFacets(
+        [("delivery", company) for company in _items(delivery)] + [("renter", company) for company in _items(renter)],
+        _items(categories),
+    )
+    _state["sources"], _state["facets"] = sources, facets
+    return facets
+
+
+def _role(company_type: Optional[str]) -> Optional[str]:
+    """
+    The role of a company_type parameter. Values other than the two function names
+    (e.g. "renter" or "renters") are matched against the role facet and reported
+    under "unmatched" when they name no role, instead of searching every role.
+    """
+    if not company_type:
+        return None
+    return COMPANY_ROLES.get(company_type, str(company_type))
+
+
+def _items(payload: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return ((payload or {}).get("data") or {}).get("itemList") or []
+
+
+async def search_companies_by_facets(company_type: Optional[str] = None, city: Optional[str] = None,
+                                     category: Optional[str] = None, min_rating: Any = None) -> Dict[str, Any]:
+    """
+    The companies matching every given facet, with their count and the city and
+    category counts among them.
+    """
+    facets = await get_company_facets(with_categories=bool(category))
+    if facets is None:
+        return upstream_error("The company list")
+    if category and not facets.has_categories:
+        return upstream_error("The category list")
+
+    bits, unmatched, substituted = facets.search(_role(company_type), city, category, _number(min_rating))
+    positions = list(_positions(bits))
+    companies = [facets.companies[position] for position in positions[:FACET_RESULT_LIMIT]]
+    result = {
+        "totalCount": len(positions),
+        "facets": {"city": facets.cities.counts(bits)},
+        "companies": filter_company_info({"data": {"itemList": companies}})["items"],
+    }
+    if facets.has_categories:
+        result["facets"]["category"] = facets.categories.counts(bits)
+    if unmatched:
+        result["unmatched"] = unmatched
+    if substituted:
+        # The answer is for these values, not the spelling in the question.
+        result["matched"] = substituted
+    return result
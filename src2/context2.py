@@ -2,50 +2,36 @@
 
 import os
 from pydantic import BaseModel
-from langchain_groq import ChatGroq
-from langchain.schema import HumanMessage
 from dotenv import load_dotenv
 import logging
-import tiktoken
+from typing import AsyncIterator, Tuple, Dict, Any
 from sumary2 import summarize_extracted_text
+from llm_registry2 import get_llm, count_tokens
 # Load environment variables from .env
 load_dotenv()
 
+# Payloads up to this many tokens are answered in a single LLM call; larger ones
+# are summarized first.
+ANSWER_TOKEN_BUDGET = int(os.getenv("ANSWER_TOKEN_BUDGET", "8000"))
+
 # Define request model
 class QueryRequest(BaseModel):
     query: str
 
-def generate_response_from_groq(input_text: str, query: str = "", custom_prompt: str = None) -> str:
+def _answer_messages(input_text: str, query: str = "", custom_prompt: str = None) -> list:
+    from langchain.schema import HumanMessage
+
     base_prompt = custom_prompt or (
         "give the consise and exact response of user query and not show any type of id like Company id and other\n"
     )
 
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    if not groq_api_key:
-        raise ValueError("GROQ_API_KEY is not set in environment variables.")
-
     # Use the full input_text without truncation
     full_input = f"{base_prompt}User Query: {query}\n\nJSON Data:\n{input_text}"
 
-    def count_tokens(text):
-        if tiktoken:
-            enc = tiktoken.encoding_for_model("gpt-3.5-turbo")
-            return len(enc.encode(text))
-        else:
-            # Approximate: 1 token ≈ 4 characters
-            return len(text) // 4
-
-    # logging.info(f"[Token Log] base_prompt tokens: {count_tokens(base_prompt)}")
-    # logging.info(f"[Token Log] input_text tokens: {count_tokens(input_text)}")
-    # logging.info(f"[Token Log] full_input tokens: {count_tokens(full_input)}")
-
-    llm = ChatGroq(
-        model_name="meta-llama/llama-4-scout-17b-16e-instruct",
-        api_key=groq_api_key
-    )
+    return [HumanMessage(content=full_input)]
 
-    messages = [HumanMessage(content=full_input)]
-    response = llm.invoke(messages)
+async def generate_response_from_groq(input_text: str, query: str = "", custom_prompt: str = None) -> str:
+    response = await get_llm().ainvoke(_answer_messages(input_text, query, custom_prompt))
 
     # Try to log response token count
     response_text = getattr(response, 'content', str(response))
@@ -54,15 +40,41 @@ def generate_response_from_groq(input_text: str, query: str = "", custom_prompt:
 
     return response.content
 
+async def stream_response_from_groq(input_text: str, query: str = "", custom_prompt: str = None) -> AsyncIterator[str]:
+    """
+    Streams the answer text as the model generates it.
+    """
+    async for chunk in get_llm().astream(_answer_messages(input_text, query, custom_prompt)):
+        if chunk.content:
+            yield chunk.content
 
 import asyncio
 
-def process_full_api_response(input_text: str, query: str = "", custom_prompt: str = None) -> str:
-    # First, summarize the input text asynchronously
-    summary = asyncio.run(summarize_extracted_text(input_text))
+async def process_full_api_response(input_text: str, query: str = "", custom_prompt: str = None) -> str:
+    input_tokens = await asyncio.to_thread(count_tokens, input_text)
+    if input_tokens <= ANSWER_TOKEN_BUDGET:
+        logging.info(f"[Answer] single pass for {input_tokens} tokens")
+        return await generate_response_from_groq(input_text, query=query, custom_prompt=custom_prompt)
+
+    # Oversized payload: summarize it first, then answer from the summary
+    logging.info(f"[Answer] {input_tokens} tokens exceed ANSWER_TOKEN_BUDGET={ANSWER_TOKEN_BUDGET}, summarizing first")
+    summary = await summarize_extracted_text(input_text)
     # print("this is summary : ",summary)
     # Now pass the summary to your Groq-based response generator
-    final_response = generate_response_from_groq(summary, query=query, custom_prompt=custom_prompt)
+    final_response = await generate_response_from_groq(summary, query=query, custom_prompt=custom_prompt)
     
     return final_response
 
+
+async def stream_full_api_response(input_text: str, query: str = "", custom_prompt: str = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming counterpart of process_full_api_response. Yields ("summarizing", ...)
+    before an oversized payload is summarized, then ("token", {"text": ...}) events.
+    """
+    input_tokens = await asyncio.to_thread(count_tokens, input_text)
+    if input_tokens > ANSWER_TOKEN_BUDGET:
+        yield "summarizing", {"input_tokens": input_tokens}
+        input_text = await summarize_extracted_text(input_text)
+
+    async for text in stream_response_from_groq(input_text, query=query, custom_prompt=custom_prompt):
+        yield "token", {"text": text}
@@ -0,0 +1,201 @@
+"""
+Embedding backends for the function index and query routing.
+
+EMBEDDING_BACKEND=torch (default) runs the sentence-transformers model through
+HuggingFaceEmbeddings. EMBEDDING_BACKEND=onnx runs an int8-quantized ONNX export
+of the same model with onnxruntime on CPU, without importing torch.
+
+Export and compare the ONNX model (needs the torch backend installed):
+    python embedding_backends2.py export
+    python embedding_backends2.py parity
+"""
+import os
+import sys
+import logging
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+from dotenv import load_dotenv
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_model")
+ONNX_MODEL_FILE = "model_quantized.onnx"
+ONNX_MAX_LENGTH = int(os.getenv("ONNX_MAX_LENGTH", "256"))
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))
+PARITY_MIN_COSINE = 0.99
+
+PARITY_SAMPLES = [
+    "List all delivery companies",
+    "show all equipment under company Pennco",
+    "Check if Bobcat is available in Pennco",
+    "Show my cancelled bookings",
+    "Show my payments between date 2025-07-02 and 2025-07-02",
+    "get vehicle list of tagline",
+]
+
+
+# -------------------------
+# ONNX Backend
+# -------------------------
+class OnnxEmbeddings(Embeddings):
+    """
+    Mean-pooled, L2-normalized sentence embeddings from an ONNX export of a
+    sentence-transformers model, matching all-MiniLM-L6-v2's pooling.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, batch_size: int = 32):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=onnx needs onnxruntime and tokenizers: pip install onnxruntime tokenizers"
+            ) from e
+
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found. Run 'python embedding_backends2.py export' first."
+            )
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=ONNX_MAX_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_NUM_THREADS:
+            options.intra_op_num_threads = ONNX_NUM_THREADS
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.batch_size = batch_size
+        logging.info(f"Loaded ONNX embedding model from {model_path}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+
+# -------------------------
+# Factory
+# -------------------------
+def embedding_model_id() -> str:
+    """
+    Identifies the model and backend in the index manifest, so switching backend
+    rebuilds the index with matching vectors.
+    """
+    if EMBEDDING_BACKEND == "onnx":
+        return f"{EMBEDDING_MODEL_NAME}:onnx-int8"
+    return EMBEDDING_MODEL_NAME
+
+
+@lru_cache(maxsize=None)
+def create_embeddings(backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    """
+    Returns the process-wide embeddings instance for `backend`.
+    """
+    if backend == "onnx":
+        return OnnxEmbeddings()
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Use 'torch' or 'onnx'.")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+
+# -------------------------
+# Export and Parity
+# -------------------------
+def export_onnx_model(model_name: str = EMBEDDING_MODEL_NAME, output_dir: str = ONNX_MODEL_DIR) -> str:
+    """
+    Exports `model_name` to ONNX and quantizes its weights to int8. Writes
+    model_quantized.onnx and tokenizer.json to `output_dir`.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=14,
+        )
+
+    quantized_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    tokenizer.save_pretrained(output_dir)
+    logging.info(f"Quantized ONNX model written to {quantized_path}")
+    return quantized_path
+
+
+def check_parity(texts: Optional[List[str]] = None, min_cosine: float = PARITY_MIN_COSINE) -> Dict[str, Any]:
+    """
+    Embeds `texts` with the torch and ONNX backends and compares them by cosine similarity.
+    """
+    texts = texts or PARITY_SAMPLES
+    reference = np.asarray(create_embeddings("torch").embed_documents(texts), dtype=np.float32)
+    candidate = np.asarray(create_embeddings("onnx").embed_documents(texts), dtype=np.float32)
+
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate /= np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    return {
+        "texts": len(texts),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "passed": bool(cosines.min() >= min_cosine),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "export":
+        print(export_onnx_model())
+    elif command == "parity":
+        result = check_parity()
+        print(result)
+        sys.exit(0 if result["passed"] else 1)
+    else:
+        print("Usage: python embedding_backends2.py [export|parity]")
+        sys.exit(2)
@@ -0,0 +1,239 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from typing import Optional, Dict, Any, List, Tuple
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain.schema import Document
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes.
+    fcntl = None
+
+from embedding_backends2 import embedding_model_id
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "fun_Vector_DB")
+# Build the index before deploy with build_index.py; set to "true" to re-embed changed entries at startup.
+INDEX_BUILD_ON_STARTUP = os.getenv("INDEX_BUILD_ON_STARTUP", "false").lower() == "true"
+FAISS_MMAP = os.getenv("FAISS_MMAP", "true").lower() == "true"
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.json"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".build.lock"
+# Version 2: raw FAISS index plus a JSON docstore instead of LangChain's index.pkl.
+MANIFEST_VERSION = 2
+
+
+# -------------------------
+# Manifest
+# -------------------------
+def entry_hash(document: Document) -> str:
+    """
+    Content hash of one catalog entry: its text plus metadata.
+    """
+    payload = json.dumps(
+        {"content": document.page_content, "metadata": document.metadata},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def read_manifest(index_path: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable index manifest {path}: {e}")
+        return None
+
+
+def write_manifest(index_path: str, hashes: Dict[str, str], embedding_model: str) -> None:
+    path = os.path.join(index_path, MANIFEST_FILE)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "embedding_model": embedding_model,
+        "entries": hashes,
+    }
+    _replace_file(path, lambda tmp: _write_json(tmp, manifest, indent=2, sort_keys=True))
+
+
+def diff_manifest(manifest: Optional[Dict[str, Any]], hashes: Dict[str, str],
+                  embedding_model: str) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    Returns (changed, removed) entry names, or None when the index must be rebuilt
+    from scratch (no manifest, another manifest version or another embedding model).
+    """
+    if not manifest or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    if manifest.get("embedding_model") != embedding_model:
+        return None
+    indexed = manifest.get("entries", {})
+    changed = [name for name, digest in hashes.items() if indexed.get(name) != digest]
+    removed = [name for name in indexed if name not in hashes]
+    return changed, removed
+
+
+# -------------------------
+# Index Sync
+# -------------------------
+def sync_index(index_path: str, documents: List[Document], embeddings,
+               embedding_model: Optional[str] = None, update: bool = True) -> Tuple[FAISS, str]:
+    """
+    Loads the FAISS index at `index_path` and brings it in line with `documents`,
+    re-embedding only entries whose content hash changed. Documents are keyed by
+    their "name" metadata. With update=False a stale index is loaded as-is.
+    """
+    embedding_model = embedding_model or embedding_model_id()
+    hashes = {doc.metadata["name"]: entry_hash(doc) for doc in documents}
+    # Workers starting together take turns: the first builds, the others find the index up to date.
+    with _build_lock(index_path):
+        return _sync_index(index_path, documents, embeddings, embedding_model, hashes, update)
+
+
+def _sync_index(index_path: str, documents: List[Document], embeddings, embedding_model: str,
+                hashes: Dict[str, str], update: bool) -> Tuple[FAISS, str]:
+    diff = diff_manifest(read_manifest(index_path), hashes, embedding_model)
+    index_exists = index_files_exist(index_path)
+
+    if diff is None or not index_exists:
+        if not update and index_exists:
+            logging.warning("FAISS index has no matching manifest; loading it as-is (INDEX_BUILD_ON_STARTUP=false).")
+            return load_index(index_path, embeddings), "Loaded existing FAISS index without manifest check."
+        logging.info(f"Building FAISS index for {len(documents)} catalog entries...")
+        vectors = FAISS.from_documents(documents, embeddings, ids=list(hashes.keys()))
+        _save(vectors, index_path, hashes, embedding_model)
+        return vectors, "Vector embeddings created and saved."
+
+    changed, removed = diff
+    if not changed and not removed:
+        logging.info("FAISS index is up to date.")
+        return load_index(index_path, embeddings), "Loaded existing FAISS index."
+
+    if not update:
+        logging.warning(f"FAISS index is stale ({len(changed)} changed, {len(removed)} removed entries); "
+                        "run build_index.py to update it.")
+        return load_index(index_path, embeddings), "Loaded stale FAISS index."
+
+    # Updates need a writable, fully loaded index rather than a read-only mapping.
+    vectors = load_index(index_path, embeddings, mmap=False)
+    logging.info(f"Updating FAISS index: {len(changed)} changed, {len(removed)} removed entries.")
+    indexed = set(vectors.index_to_docstore_id.values())
+    stale_ids = [name for name in changed + removed if name in indexed]
+    if stale_ids:
+        vectors.delete(stale_ids)
+    if changed:
+        by_name = {doc.metadata["name"]: doc for doc in documents}
+        vectors.add_documents([by_name[name] for name in changed], ids=changed)
+    _save(vectors, index_path, hashes, embedding_model)
+    return vectors, f"Re-embedded {len(changed)} and removed {len(removed)} catalog entries."
+
+
+def index_files_exist(index_path: str) -> bool:
+    return all(os.path.exists(os.path.join(index_path, name)) for name in (INDEX_FILE, DOCSTORE_FILE))
+
+
+def load_index(index_path: str, embeddings, mmap: bool = FAISS_MMAP) -> FAISS:
+    """
+    Loads the FAISS index and its JSON docstore. With mmap=True the vectors are
+    memory-mapped read-only, so worker processes share the same page cache.
+    """
+    logging.info(f"Loading existing FAISS index from disk (mmap={mmap})...")
+    index = _read_faiss_index(os.path.join(index_path, INDEX_FILE), mmap)
+
+    with open(os.path.join(index_path, DOCSTORE_FILE), 'r') as file:
+        stored = json.load(file)
+    documents = {
+        doc_id: Document(page_content=doc["page_content"], metadata=doc.get("metadata", {}))
+        for doc_id, doc in stored["documents"].items()
+    }
+    index_to_docstore_id = dict(enumerate(stored["index_to_docstore_id"]))
+    return FAISS(embeddings, index, InMemoryDocstore(documents), index_to_docstore_id)
+
+
+def _read_faiss_index(path: str, mmap: bool):
+    if not mmap:
+        return faiss.read_index(path)
+    # IO_FLAG_MMAP_IFC maps flat indexes; older faiss builds only know IO_FLAG_MMAP.
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError as e:
+        logging.warning(f"Memory-mapped load of {path} failed ({e}); reading it into memory instead.")
+        return faiss.read_index(path)
+
+
+def _save(vectors: FAISS, index_path: str, hashes: Dict[str, str], embedding_model: str) -> None:
+    """
+    Writes the raw FAISS index, a JSON docstore and the manifest. Each file is
+    written to a unique temporary name first so running workers never see a partial file.
+    """
+    os.makedirs(index_path, exist_ok=True)
+    ids = [vectors.index_to_docstore_id[i] for i in range(vectors.index.ntotal)]
+    documents = {}
+    for doc_id in ids:
+        doc = vectors.docstore.search(doc_id)
+        documents[doc_id] = {"page_content": doc.page_content, "metadata": doc.metadata}
+
+    _replace_file(os.path.join(index_path, INDEX_FILE), lambda tmp: faiss.write_index(vectors.index, tmp))
+    _replace_file(
+        os.path.join(index_path, DOCSTORE_FILE),
+        lambda tmp: _write_json(tmp, {"index_to_docstore_id": ids, "documents": documents}, ensure_ascii=False),
+    )
+
+    legacy_pickle = os.path.join(index_path, "index.pkl")
+    if os.path.exists(legacy_pickle):
+        os.remove(legacy_pickle)
+
+    write_manifest(index_path, hashes, embedding_model)
+    logging.info(f"Embeddings saved at {index_path}.")
+
+
+def _write_json(path: str, data: Any, **options) -> None:
+    with open(path, 'w') as file:
+        json.dump(data, file, **options)
+
+
+def _replace_file(path: str, write) -> None:
+    """
+    Calls write(temporary path) on a unique file next to `path`, then moves it into place.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+@contextmanager
+def _build_lock(index_path: str):
+    """
+    Holds an exclusive lock on the index directory across processes while it is checked, built or swapped.
+    """
+    os.makedirs(index_path, exist_ok=True)
+    with open(os.path.join(index_path, LOCK_FILE), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
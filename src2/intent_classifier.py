@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import logging
+from dotenv import load_dotenv
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from function_catalog2 import parse_catalog
+from routing_cache2 import substitute_entities
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+KNN_K = int(os.getenv("KNN_K", "5"))
+KNN_CONFIDENCE_THRESHOLD = float(os.getenv("KNN_CONFIDENCE_THRESHOLD", "0.7"))
+KNN_MIN_SIMILARITY = float(os.getenv("KNN_MIN_SIMILARITY", "0.55"))
+KNN_TEMPERATURE = float(os.getenv("KNN_TEMPERATURE", "0.05"))
+
+QUERY_LINE = re.compile(r"^\s*User Query:\s*(.*)$")
+FUNCTION_LINE = re.compile(r"^\s*→\s*Function:\s*(\w+)")
+PARAMETERS_LINE = re.compile(r"^\s*→\s*Parameters:\s*(\{.*\})")
+DISPATCH_LINE = re.compile(r'^\s*→\s*function_name:\s*"([^"]+)"\s*,\s*arg:\s*(.+?)\s*$')
+
+
+# -------------------------
+# Example Parsing
+# -------------------------
+def load_examples(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Parses the labelled "User Query → Function → Parameters" examples of a function
+    catalog into one entry per example query.
+    """
+    with open(file_path, 'r') as file:
+        catalog = parse_catalog(file.read())
+
+    examples = []
+    for entry in catalog:
+        examples.extend(_parse_entry_examples(entry))
+    logging.info(f"Loaded {len(examples)} routing examples from {file_path}")
+    return examples
+
+
+def _parse_entry_examples(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Reads the example groups of one catalog entry: a "User Query" line followed by
+    its "→ Function", "→ Parameters" or "→ function_name/arg" lines.
+    """
+    examples = []
+    group = None
+
+    def flush():
+        if group and group["queries"]:
+            examples.extend(_align_group(group))
+
+    for line in entry["content"].splitlines():
+        query_line = QUERY_LINE.match(line)
+        if query_line:
+            flush()
+            group = {
+                "function_name": entry["name"],
+                "queries": re.findall(r'"([^"]+)"', query_line.group(1)),
+                "parameters": [],
+            }
+            continue
+
+        if group is None:
+            continue
+
+        function_line = FUNCTION_LINE.match(line)
+        if function_line:
+            group["function_name"] = function_line.group(1)
+            continue
+
+        parameters_line = PARAMETERS_LINE.match(line)
+        if parameters_line:
+            try:
+                group["parameters"].append(json.loads(parameters_line.group(1)))
+            except json.JSONDecodeError as e:
+                logging.warning(f"Skipping unparseable example parameters '{parameters_line.group(1)}': {e}")
+            continue
+
+        dispatch_line = DISPATCH_LINE.match(line)
+        if dispatch_line:
+            arg = dispatch_line.group(2).strip().strip('"')
+            group["parameters"].append({
+                "function_name": dispatch_line.group(1),
+                "arg": None if arg == "None" else arg,
+            })
+
+    flush()
+    return examples
+
+
+def _align_group(group: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Pairs every example query of a group with the parameter set it mentions and
+    splits parameters into entity slots (taken from the query) and constants.
+    """
+    parameter_sets = group["parameters"] or [{}]
+    slot_keys = {
+        key
+        for parameters in parameter_sets
+        for key, value in parameters.items()
+        if any(_mentions(query, value) for query in group["queries"])
+    }
+
+    examples = []
+    for query in group["queries"]:
+        parameters = max(
+            parameter_sets,
+            key=lambda p: sum(1 for key in slot_keys if _mentions(query, p.get(key))),
+        )
+        aligned = all(_mentions(query, parameters[key]) for key in slot_keys if key in parameters)
+        constants = {key: value for key, value in parameters.items() if key not in slot_keys}
+        examples.append({
+            "query": query,
+            "function_name": group["function_name"],
+            "parameters": parameters,
+            "constants": constants,
+            "aligned": aligned,
+        })
+    return examples
+
+
+def _mentions(query: str, value: Any) -> bool:
+    """True if `value` is a string that occurs in `query` as whole words."""
+    if not isinstance(value, str) or not value.strip():
+        return False
+    return re.search(rf"(?<!\w){re.escape(value)}(?!\w)", query, flags=re.IGNORECASE) is not None
+
+
+# -------------------------
+# Core Class
+# -------------------------
+class IntentClassifier:
+    """
+    Routes a query by k-nearest-neighbour vote over embedded example queries.
+    Votes are cast per label (function name, constant parameters and slot names) and weighted
+    by a softmax over cosine similarity; the winning label's share is the confidence.
+    """
+
+    def __init__(self, examples: List[Dict[str, Any]], vectors: List[List[float]],
+                 k: int = KNN_K, confidence_threshold: float = KNN_CONFIDENCE_THRESHOLD,
+                 min_similarity: float = KNN_MIN_SIMILARITY, temperature: float = KNN_TEMPERATURE):
+        self.examples = examples
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+        self.k = k
+        self.confidence_threshold = confidence_threshold
+        self.min_similarity = min_similarity
+        self.temperature = temperature
+
+    @classmethod
+    def from_catalog(cls, file_path: str, embeddings) -> "IntentClassifier":
+        """
+        Builds the classifier by embedding every example query of the catalog in one batch.
+        """
+        examples = load_examples(file_path)
+        vectors = embeddings.embed_documents([example["query"] for example in examples]) if examples else []
+        return cls(examples, vectors)
+
+    def classify(self, query: str, vector: List[float]) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Returns (routing, confidence). `routing` is None when the vote is below the
+        confidence threshold or the entity slots cannot be taken from the query.
+        """
+        if not self.examples:
+            return None, 0.0
+
+        query_vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm:
+            query_vector = query_vector / norm
+
+        scores = self.matrix @ query_vector
+        top = np.argsort(-scores)[:self.k]
+        if scores[top[0]] < self.min_similarity:
+            return None, 0.0
+
+        weights = np.exp((scores[top] - scores[top[0]]) / self.temperature)
+        votes = defaultdict(float)
+        for i, weight in zip(top, weights):
+            votes[_label(self.examples[i])] += float(weight)
+        total = sum(votes.values())
+
+        label, weight = max(votes.items(), key=lambda item: item[1])
+        confidence = weight / total
+        if confidence < self.confidence_threshold:
+            return None, confidence
+
+        for i in top:
+            example = self.examples[i]
+            if _label(example) != label or not example["aligned"]:
+                continue
+            slots = {key: value for key, value in example["parameters"].items() if key not in example["constants"]}
+            parameters = substitute_entities(example["query"], slots, query)
+            if parameters is not None:
+                parameters = {**example["constants"], **parameters}
+                return {"function_name": example["function_name"], "parameters": parameters}, confidence
+
+        return None, confidence
+
+
+def _label(example: Dict[str, Any]) -> str:
+    """Function name, constant parameters and slot names: the unit the vote is taken over."""
+    slots = sorted(key for key in example["parameters"] if key not in example["constants"])
+    return json.dumps([example["function_name"], example["constants"], slots], sort_keys=True)
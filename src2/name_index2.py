@@ -0,0 +1,165 @@
+"""
+Fuzzy lookup of company and asset names in the cached catalog.
+
+Names are normalized (case, accents and punctuation, plus Arabic diacritics,
+tatweel and letter variants, so `ar_name` values match however they are typed)
+and indexed by character trigrams. A lookup only scores the names that share
+trigrams with the query: an exact match scores 1, a name containing the query or
+contained in it scores by how much of it the query covers, and anything else by
+trigram overlap, which is what lets typos resolve. Indexes are built once per
+catalog list and reused until the catalog cache replaces the list.
+"""
+import os
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+# Lowest score a fuzzy match needs to be returned.
+NAME_MATCH_THRESHOLD = float(os.getenv("NAME_MATCH_THRESHOLD", "0.5"))
+# Shortest name whose containment in the query (or the query's in it) counts as a match.
+MIN_CONTAINED_LENGTH = 3
+# Names sharing the most trigrams with the query that are scored.
+MAX_CANDIDATES = 50
+# Indexes kept, one per catalog list.
+MAX_INDEXES = 64
+
+ARABIC_LETTERS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ـ": None})
+NON_WORD = re.compile(r"[\W_]+")
+
+
+# -------------------------
+# Normalization
+# -------------------------
+def normalize_name(text: str) -> str:
+    """
+    Case-folds text and strips accents, Arabic diacritics and punctuation, e.g.
+    "Al-Rashid Équipements" -> "al rashid equipements".
+    """
+    decomposed = unicodedata.normalize("NFKD", str(text or "").translate(ARABIC_LETTERS))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return NON_WORD.sub(" ", stripped.casefold()).strip()
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# -------------------------
+# Index
+# -------------------------
+class NameIndex:
+    def __init__(self, entries: Iterable[Tuple[Any, Iterable[str]]]):
+        """
+        `entries` pairs each item with its names; items are returned in this order on ties.
+        """
+        self._items: List[Any] = []
+        self._keys: List[Tuple[str, int, int]] = []  # (normalized name, item position, trigram count)
+        self._exact: Dict[str, List[int]] = {}
+        self._postings: Dict[str, List[int]] = {}
+        for item in entries:
+            self._add(*item)
+
+    def _add(self, item: Any, names: Iterable[str]) -> None:
+        position = len(self._items)
+        self._items.append(item)
+        for name in names:
+            key = normalize_name(name)
+            if not key:
+                continue
+            key_id = len(self._keys)
+            grams = trigrams(key)
+            self._keys.append((key, position, len(grams)))
+            self._exact.setdefault(key, []).append(key_id)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key_id)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def search(self, query: str, limit: int = 5, threshold: float = NAME_MATCH_THRESHOLD) -> List[Tuple[Any, float]]:
+        """
+        Returns up to `limit` (item, score) pairs scoring at least `threshold`, best first.
+        """
+        key = normalize_name(query)
+        if not key:
+            return []
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        candidates = [key_id for key_id, _ in shared.most_common(MAX_CANDIDATES)]
+        candidates.extend(self._exact.get(key, ()))
+
+        best: Dict[int, float] = {}
+        for key_id in candidates:
+            name, position, gram_count = self._keys[key_id]
+            score = _score(key, name, shared[key_id], len(grams), gram_count)
+            if score >= threshold and score > best.get(position, 0.0):
+                best[position] = score
+        ranked = sorted(best.items(), key=lambda entry: (-entry[1], entry[0]))
+        return [(self._items[position], round(score, 3)) for position, score in ranked[:limit]]
+
+    def best(self, query: str, threshold: float = NAME_MATCH_THRESHOLD) -> Optional[Any]:
+        exact = self._exact.get(normalize_name(query))
+        if exact:
+            return self._items[self._keys[exact[0]][1]]
+        matches = self.search(query, limit=1, threshold=threshold)
+        return matches[0][0] if matches else None
+
+
+def _score(query: str, name: str, shared: int, query_grams: int, name_grams: int) -> float:
+    if query == name:
+        return 1.0
+    # Dice coefficient of the two trigram sets.
+    dice = 2.0 * shared / (query_grams + name_grams)
+    shorter, longer = sorted((len(query), len(name)))
+    if shorter >= MIN_CONTAINED_LENGTH and (query in name or name in query):
+        # Weighted by how much of the longer string the contained one covers, so a
+        # short name inside a long query does not outrank real matches.
+        return max(dice, 0.4 + 0.55 * shorter / longer)
+    return dice
+
+
+# -------------------------
+# Catalog Indexes
+# -------------------------
+_indexes: "OrderedDict[Tuple[int, Callable], Tuple[Any, NameIndex]]" = OrderedDict()
+
+
+def index_for(items: List[Dict[str, Any]], names: Callable[[Dict[str, Any]], Iterable[str]]) -> NameIndex:
+    """
+    Returns the index of a catalog item list, building it on first use. The list is
+    held with its index, so a list replaced in the catalog cache gets a new one.
+    """
+    key = (id(items), names)
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] is items:
+        _indexes.move_to_end(key)
+        return cached[1]
+    index = NameIndex((item, names(item)) for item in items)
+    _indexes[key] = (items, index)
+    while len(_indexes) > MAX_INDEXES:
+        _indexes.popitem(last=False)
+    return index
+
+
+def company_names(company: Dict[str, Any]) -> List[str]:
+    return [company.get("name") or "", company.get("ar_name") or ""]
+
+
+def vehicle_names(item: Dict[str, Any]) -> List[str]:
+    details = item.get("vehicleDetails") or {}
+    return [details.get("sizeType") or "", details.get("ar_sizeType") or ""]
+
+
+def equipment_names(item: Dict[str, Any]) -> List[str]:
+    details = item.get("equipmentDetails") or {}
+    return [details.get("equipmentName") or "", details.get("ar_equipmentName") or ""]
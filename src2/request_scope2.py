@@ -0,0 +1,83 @@
+"""
+Request-scoped execution of upstream calls.
+
+Calls made through call() while a request_scope() is active start as tasks that
+are memoized by function and arguments, so identical calls within one request
+share a single upstream round trip. Independent calls run concurrently when they
+are started before either is awaited; a call that needs another's result awaits
+its task, so the tasks of a request form a dependency graph that runs as soon as
+each dependency resolves. Outside a scope, call() simply starts the call.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+_current_scope: ContextVar[Optional["RequestScope"]] = ContextVar("request_scope", default=None)
+
+
+# -------------------------
+# Scope
+# -------------------------
+class RequestScope:
+    def __init__(self):
+        self._tasks: Dict[Tuple, asyncio.Future] = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    @staticmethod
+    def key(function, args: Tuple, kwargs: Dict[str, Any]) -> Optional[Tuple]:
+        key = (function, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            # Calls with unhashable arguments are not memoized.
+            return None
+        return key
+
+    def call(self, function, *args, **kwargs) -> asyncio.Future:
+        key = self.key(function, args, kwargs)
+        task = self._tasks.get(key) if key is not None else None
+        if task is not None:
+            self.deduplicated += 1
+            return task
+        self.calls += 1
+        task = asyncio.ensure_future(function(*args, **kwargs))
+        self._tasks[key if key is not None else (function, id(task))] = task
+        return task
+
+    async def close(self) -> None:
+        """
+        Cancels calls that were started but never awaited, e.g. after an early
+        return, and collects the errors of failed ones.
+        """
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@asynccontextmanager
+async def request_scope() -> AsyncIterator[RequestScope]:
+    scope = RequestScope()
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        await scope.close()
+        logging.info(f"Request made {scope.calls} upstream calls, {scope.deduplicated} served by earlier identical calls")
+
+
+def call(function, *args, **kwargs) -> asyncio.Future:
+    """
+    Starts function(*args, **kwargs) and returns its task, shared with identical
+    calls made earlier in the current request.
+    """
+    scope = _current_scope.get()
+    if scope is None:
+        return asyncio.ensure_future(function(*args, **kwargs))
+    return scope.call(function, *args, **kwargs)
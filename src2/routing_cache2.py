@@ -0,0 +1,214 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+from dotenv import load_dotenv
+
+import numpy as np
+
+load_dotenv()
+
+# -------------------------
+# Constants
+# -------------------------
+ROUTING_CACHE_THRESHOLD = float(os.getenv("ROUTING_CACHE_THRESHOLD", "0.92"))
+ROUTING_CACHE_TTL = float(os.getenv("ROUTING_CACHE_TTL", "600"))
+ROUTING_CACHE_SIZE = int(os.getenv("ROUTING_CACHE_SIZE", "256"))
+# Parameter values that name a function or list rather than quote the query.
+CONSTANT_VALUE = re.compile(r"[a-z]+(?:_[a-z0-9]+)+")
+
+
+# -------------------------
+# Entity Substitution
+# -------------------------
+def substitute_entities(cached_query: str, parameters: Dict[str, Any], new_query: str) -> Optional[Dict[str, Any]]:
+    """
+    Re-maps entity parameters (names, cities, dates, numbers) that appear verbatim
+    in `cached_query` onto the matching spans of `new_query`. Returns None when the
+    new query does not have the same shape, or when an entity value cannot be found
+    in `cached_query` and so cannot be re-mapped, so the caller can treat it as a miss.
+    """
+    slots = []
+    taken = []
+    lowered = cached_query.lower()
+    # Longest values first so "Fresh water tank" wins over "water".
+    candidates = sorted(
+        ((key, _entity_text(value)) for key, value in parameters.items() if _entity_text(value)),
+        key=lambda kv: len(kv[1]),
+        reverse=True,
+    )
+    for key, value in candidates:
+        # Equal values (e.g. start_date == end_date) claim successive occurrences.
+        for found in re.finditer(re.escape(value.lower()), lowered):
+            start, end = found.span()
+            if any(start < t_end and end > t_start for t_start, t_end in taken):
+                continue
+            taken.append((start, end))
+            slots.append((start, end, key))
+            break
+        else:
+            # Reusing the value as-is could answer "renters in delhi" with noida's companies.
+            return None
+
+    if not slots:
+        # Only constants such as company_type: the route applies unchanged.
+        return dict(parameters)
+
+    slots.sort()
+    pattern = ""
+    cursor = 0
+    for i, (start, end, _) in enumerate(slots):
+        pattern += _literal_pattern(cached_query[cursor:start]) + f"(?P<slot{i}>.+?)"
+        cursor = end
+    pattern += _literal_pattern(cached_query[cursor:])
+
+    match = re.fullmatch(pattern, new_query.strip(), flags=re.IGNORECASE)
+    if not match:
+        return None
+
+    substituted = dict(parameters)
+    for i, (_, _, key) in enumerate(slots):
+        substituted[key] = match.group(f"slot{i}").strip()
+    return substituted
+
+
+def _entity_text(value: Any) -> Optional[str]:
+    """
+    The text of a parameter value taken from the query, or None for constants:
+    None, booleans and identifiers such as "get_renter_companies".
+    """
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    text = str(value).strip()
+    if not text or CONSTANT_VALUE.fullmatch(text):
+        return None
+    return text
+
+
+def _literal_pattern(text: str) -> str:
+    """Escapes a literal query segment while tolerating whitespace differences."""
+    parts = [re.escape(part) for part in text.split()]
+    pattern = r"\s+".join(parts)
+    if text[:1].isspace():
+        pattern = r"\s*" + pattern
+    if text[-1:].isspace() and parts:
+        pattern += r"\s*"
+    return pattern
+
+
+# -------------------------
+# Core Class
+# -------------------------
+class SemanticRoutingCache:
+    """
+    Caches routing decisions (function name and parameters) keyed on the query
+    embedding, with TTL expiry, LRU eviction and hit/miss counters.
+    """
+
+    def __init__(self, threshold: float = ROUTING_CACHE_THRESHOLD, ttl: float = ROUTING_CACHE_TTL,
+                 max_entries: int = ROUTING_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup(self, query: str, vector: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached routing for the most similar query above the threshold,
+        with entity slots re-substituted from `query`, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+
+        key = _normalize(query)
+        query_vector = _unit(vector)
+        with self._lock:
+            self._evict_expired()
+            candidates = []
+            if key in self._entries:
+                candidates.append((1.0, key))
+            elif self._entries:
+                keys = list(self._entries.keys())
+                matrix = np.stack([self._entries[k]["vector"] for k in keys])
+                scores = matrix @ query_vector
+                order = np.argsort(-scores)
+                candidates = [(float(scores[i]), keys[i]) for i in order if scores[i] >= self.threshold]
+
+            for score, candidate in candidates:
+                entry = self._entries[candidate]
+                parameters = substitute_entities(entry["query"], entry["routing"].get("parameters", {}), query)
+                if parameters is None:
+                    continue
+                self._entries.move_to_end(candidate)
+                self.hits += 1
+                logging.info(f"Routing cache hit (similarity={score:.3f}) for query: '{query}'")
+                return {"function_name": entry["routing"].get("function_name", ""), "parameters": parameters}
+
+            self.misses += 1
+            return None
+
+    def store(self, query: str, vector: List[float], routing: Dict[str, Any]) -> None:
+        """
+        Stores a routing decision for `query`, evicting expired and least recently used entries.
+        """
+        if not self.enabled or not routing.get("function_name"):
+            return
+
+        key = _normalize(query)
+        with self._lock:
+            self._entries[key] = {
+                "query": query.strip(),
+                "vector": _unit(vector),
+                "routing": {
+                    "function_name": routing.get("function_name"),
+                    "parameters": routing.get("parameters") or {},
+                },
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            self._entries.move_to_end(key)
+            self._evict_expired()
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+            }
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry["expires_at"] <= now]
+        for key in expired:
+            del self._entries[key]
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
@@ -1,64 +1,205 @@
-from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage
-from tiktoken import get_encoding
 import logging
 import asyncio,os
 import json
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import accumulate
 from dotenv import load_dotenv
 
+from llm_registry2 import get_llm, get_encoding, count_tokens
+
 log = logging.getLogger(__name__)
 load_dotenv()
 
-# Set up Groq client
-# groq_api_key  = "api_key"
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY is not set in environment variables.")
-llm = ChatGroq(
-    model_name="meta-llama/llama-4-scout-17b-16e-instruct",
-    api_key=groq_api_key
-)
+@lru_cache(maxsize=1)
+def get_token_lengths() -> list:
+    """
+    Byte length of every token id, for locating token boundaries without decoding.
+    """
+    encoding = get_encoding()
+    lengths = []
+    for token in range(encoding.n_vocab):
+        try:
+            lengths.append(len(encoding.decode_single_token_bytes(token)))
+        except KeyError:
+            lengths.append(0)
+    return lengths
 
-# Tokenizer setup
-encoding = get_encoding("gpt2")
 MAX_TOKENS_PER_CHUNK = 14000
+# Key of the element list in API payloads; chunks are cut between its elements.
+ITEM_LIST_KEY = "itemList"
+JSON_DECODER = json.JSONDecoder()
+WHITESPACE = re.compile(r"\s*")
+# Chunk and merge calls in flight at once for long inputs
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
 
-def count_tokens(text: str) -> int:
-    return len(encoding.encode(text))
+REDUCE_PROMPT = (
+    "Merge the following partial summaries into one summary. They are in input order; keep that order. "
+    "Keep each and every company and item, do not omit any, and keep totalCount if Available.\n"
+)
 
 def split_text_into_chunks(text: str, max_tokens: int = MAX_TOKENS_PER_CHUNK) -> list:
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
+    """
+    Splits text into chunks of at most max_tokens tokens. The text is encoded once
+    and cut on token offsets. JSON payloads are cut between elements of their item
+    list, so every chunk is valid JSON with the same envelope around its items.
+    """
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return [text]
+
+    offsets = _token_offsets(encoding, text, tokens)
+    chunks = _split_json_items(text, offsets, max_tokens)
+    if chunks is None:
+        chunks = _split_on_tokens(text, offsets, 0, len(text), max_tokens)
+    return chunks
 
-    for word in words:
-        word_tokens = len(encoding.encode(word))
-        if current_tokens + word_tokens > max_tokens:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
-            current_tokens = word_tokens
-        else:
-            current_chunk.append(word)
-            current_tokens += word_tokens
+def _token_offsets(encoding, text: str, tokens: list) -> list:
+    """
+    Character offset at which each token starts.
+    """
+    if not text.isascii():
+        return encoding.decode_with_offsets(tokens)[1]
+    # In ASCII text (json.dumps output) every byte is one character.
+    offsets = [0]
+    offsets.extend(accumulate(map(get_token_lengths().__getitem__, tokens[:-1])))
+    return offsets
 
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+def _split_on_tokens(text: str, offsets: list, start: int, end: int, max_tokens: int) -> list:
+    """
+    Cuts text[start:end] every max_tokens tokens, on token boundaries of the full text.
+    """
+    first = bisect_left(offsets, start)
+    last = bisect_left(offsets, end)
+    bounds = [start] + [offsets[i] for i in range(first + max_tokens, last, max_tokens)] + [end]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if a < b]
 
+def _split_json_items(text: str, offsets: list, max_tokens: int):
+    """
+    Packs the elements of the payload's item list into chunks, each wrapped in the
+    text before and after the list. Returns None when the text has no such list.
+    """
+    found = _find_item_list(text)
+    if found is None:
+        return None
+    items, list_start, list_end = found
+
+    def token_count(start: int, end: int) -> int:
+        return bisect_left(offsets, end) - bisect_left(offsets, start)
+
+    prefix, suffix = text[:list_start], text[list_end:]
+    # One token of slack per seam where the pieces are joined back together.
+    budget = max_tokens - token_count(0, list_start) - token_count(list_end, len(text)) - 2
+    if budget <= 0:
+        return None
+
+    chunks = []
+    group = []
+    group_tokens = 0
+
+    def flush():
+        if group:
+            chunks.append(prefix + ",".join(text[a:b] for a, b in group) + suffix)
+            group.clear()
+
+    for start, end in items:
+        item_tokens = token_count(start, end) + 1
+        if item_tokens > budget:
+            # A single element larger than a chunk can only be cut on tokens.
+            flush()
+            group_tokens = 0
+            chunks.extend(_split_on_tokens(text, offsets, start, end, max_tokens))
+            continue
+        if group and group_tokens + item_tokens > budget:
+            flush()
+            group_tokens = 0
+        group.append((start, end))
+        group_tokens += item_tokens
+    flush()
     return chunks
 
+def _find_item_list(text: str):
+    """
+    Locates the element spans of the payload's "itemList", or of its largest list
+    when there is none. Returns (spans, list_start, list_end) where each span covers
+    the whitespace before an element and the element itself, and list_start/list_end
+    are the offsets just inside the brackets around the elements.
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    key, size = _item_list_key(data)
+    if size < 2:
+        return None
+
+    if key is None:
+        openings = [re.match(r"\s*\[", text).end()]
+    else:
+        openings = [m.end() for m in re.finditer(r'"%s"\s*:\s*\[' % re.escape(key), text)]
+    for position in openings:
+        spans = _scan_elements(text, position)
+        if spans and len(spans) == size:
+            return spans, position, spans[-1][1]
+    return None
+
+def _item_list_key(data):
+    """
+    Returns (key, length) of the payload's "itemList", otherwise of its largest
+    list. key is None for a top-level list.
+    """
+    lists = list(_keyed_lists(data, None, root=True))
+    for key, value in lists:
+        if key == ITEM_LIST_KEY:
+            return key, len(value)
+    return max(((key, len(value)) for key, value in lists), key=lambda entry: entry[1], default=(None, 0))
+
+def _keyed_lists(data, key, root=False):
+    # Lists nested directly in lists have no key to find them by in the text.
+    if isinstance(data, list):
+        if key is not None or root:
+            yield key, data
+        for value in data:
+            yield from _keyed_lists(value, None)
+    elif isinstance(data, dict):
+        for child_key, value in data.items():
+            yield from _keyed_lists(value, child_key)
+
+def _scan_elements(text: str, position: int):
+    spans = []
+    start = position
+    position = WHITESPACE.match(text, position).end()
+    if text.startswith("]", position):
+        return spans
+    while True:
+        try:
+            _, end = JSON_DECODER.raw_decode(text, position)
+        except ValueError:
+            return None
+        spans.append((start, end))
+        position = WHITESPACE.match(text, end).end()
+        if text.startswith("]", position):
+            return spans
+        if not text.startswith(",", position):
+            return None
+        start = position + 1
+        position = WHITESPACE.match(text, start).end()
+
 async def summarize_extracted_text(input_text: str, custom_prompt: str = None) -> str:
     summarization_prompt = custom_prompt or (
         "summrize the given information based on user query each and every details also mention totalCount if Available"
         "Do not omit any company. Use bullet points. Do not summarize or skip any company.\n"
     )
 
-    input_token_count = count_tokens(input_text)
+    # Tokenizing and chunking large payloads is CPU work; keep it off the event loop.
+    input_token_count = await asyncio.to_thread(count_tokens, input_text)
 
     # CASE 1: Short input – summarize in one call
     if input_token_count <= MAX_TOKENS_PER_CHUNK:
         full_input = f"{summarization_prompt}\n\nInput Text:\n{input_text}\n\nSummary:"
-        response = await llm.ainvoke(full_input)
+        response = await get_llm().ainvoke(full_input)
         output_token_count = count_tokens(response.content)
         result = {
             "summary": response.content,
@@ -70,44 +211,98 @@ async def summarize_extracted_text(input_text: str, custom_prompt: str = None) -
         }
         return json.dumps(result, ensure_ascii=False, indent=2)
 
-    # CASE 2: Long input – chunk and summarize
+    # CASE 2: Long input – summarize chunks concurrently, then merge in order
     log.info(f"Input exceeds {MAX_TOKENS_PER_CHUNK} tokens. Splitting...")
-    chunks = split_text_into_chunks(input_text)
-
-    summaries = []
-    token_logs = []
-    total_input_tokens = 0
-    total_output_tokens = 0
-
-    for i, chunk in enumerate(chunks):
-        full_input = f"{summarization_prompt}\n\nInput Text:\n{chunk}\n\nSummary:"
-        input_tokens = count_tokens(full_input)
-        response = await llm.ainvoke(full_input)
-        output_text = response.content
-        output_tokens = count_tokens(output_text)
-
-        total_input_tokens += input_tokens
-        total_output_tokens += output_tokens
-
-        summaries.append(output_text)
-        token_logs.append({
-            "chunk": i+1,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens
-        })
-
-    combined_summary = "\n\n".join(summaries)
+    chunks = await asyncio.to_thread(split_text_into_chunks, input_text)
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    chunk_results = await asyncio.gather(*(
+        _summarize_chunk(semaphore, summarization_prompt, chunk, i + 1)
+        for i, chunk in enumerate(chunks)
+    ))
+    summaries = [summary for summary, _ in chunk_results]
+    token_logs = [token_log for _, token_log in chunk_results]
+
+    combined_summary, reduce_logs = await _reduce_summaries(summaries, semaphore)
+
+    total_input_tokens = sum(entry["input_tokens"] for entry in token_logs + reduce_logs)
+    total_output_tokens = sum(entry["output_tokens"] for entry in token_logs + reduce_logs)
     result = {
         "summary": combined_summary,
         "log": {
             "total_chunks": len(chunks),
             "chunk_logs": token_logs,
+            "reduce_logs": reduce_logs,
             "total_input_tokens": total_input_tokens,
             "total_output_tokens": total_output_tokens
         }
     }
     return json.dumps(result, ensure_ascii=False, indent=2)
 
+async def _summarize_chunk(semaphore: asyncio.Semaphore, prompt: str, chunk: str, chunk_number: int):
+    full_input = f"{prompt}\n\nInput Text:\n{chunk}\n\nSummary:"
+    input_tokens = count_tokens(full_input)
+    async with semaphore:
+        response = await get_llm().ainvoke(full_input)
+    output_text = response.content
+    return output_text, {
+        "chunk": chunk_number,
+        "input_tokens": input_tokens,
+        "output_tokens": count_tokens(output_text)
+    }
+
+async def _reduce_summaries(summaries: list, semaphore: asyncio.Semaphore, max_tokens: int = MAX_TOKENS_PER_CHUNK):
+    """
+    Merges chunk summaries level by level: consecutive summaries are grouped up to
+    max_tokens and each group is merged concurrently, until one summary remains or
+    no two summaries fit together. Order is preserved at every level.
+    """
+    reduce_logs = []
+    level = 0
+    while len(summaries) > 1:
+        groups = _group_in_order(summaries, max_tokens)
+        if len(groups) == len(summaries):
+            break
+        level += 1
+        merged = await asyncio.gather(*(
+            _merge_group(semaphore, group, level, i + 1) for i, group in enumerate(groups)
+        ))
+        summaries = [text for text, _ in merged]
+        reduce_logs.extend(token_log for _, token_log in merged if token_log)
+    return "\n\n".join(summaries), reduce_logs
+
+def _group_in_order(summaries: list, max_tokens: int) -> list:
+    groups = []
+    current = []
+    current_tokens = 0
+    for summary in summaries:
+        tokens = count_tokens(summary)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+async def _merge_group(semaphore: asyncio.Semaphore, group: list, level: int, group_number: int):
+    if len(group) == 1:
+        return group[0], None
+    parts = "\n\n".join(f"Part {i + 1}:\n{summary}" for i, summary in enumerate(group))
+    full_input = f"{REDUCE_PROMPT}\n\n{parts}\n\nMerged Summary:"
+    input_tokens = count_tokens(full_input)
+    async with semaphore:
+        response = await get_llm().ainvoke(full_input)
+    output_text = response.content
+    return output_text, {
+        "level": level,
+        "group": group_number,
+        "input_tokens": input_tokens,
+        "output_tokens": count_tokens(output_text)
+    }
+
 # async def main():
 #     text = "The Coordinator Workflow dispatches queries to various specialized agents, each responsible for handling specific types of requests:Policy Agent: Manages queries related to customer policies. It interacts with the CRM System (Customer Relationship Management) to retrieve or update policy information.Billing Agent: Handles billing-related inquiries. It interfaces with the Billing DB (Database) to access and process billing records.Claims Agent: Processes customer claims. It communicates with the Claims Backend system to manage claim submissions, statuses, and resolutions.AI Agent: This agent is designed to handle queries that can be resolved automatically using artificial intelligence. It interacts directly with a Large Language Model (LLM), such as ChatGPT, to generate responses or perform automated tasks."
 #     summary = await summarize_extracted_text(text)
@@ -1,8 +1,8 @@
 from api_function2 import (
-    get_booking_list,
-    get_usr_favourite_list,
-    company_cat_list,
-    get_payment_list
+    get_booking_list_async,
+    get_usr_favourite_list_async,
+    get_payment_list_async,
+    fetch_all_async
 )
 from usr_filter import(
     filter_category_details_key,
@@ -11,61 +11,71 @@ from usr_filter import(
     filter_user_orders_key,
     filter_user_payment_data
 )
-def get_user_booking_list(ststus: str | None):
+from utils2 import upstream_error
+from catalog_cache2 import get_category_companies
+async def get_user_booking_list(ststus: str | None):
     if not ststus:  # covers None or empty string
         # No status passed → return all bookings
-        return get_booking_list(status=None)
+        return await fetch_all_async(get_booking_list_async, status=None)
 
     normalized_status = ststus.lower()
     if normalized_status == "completed":
-        return get_booking_list(status="Completed")
+        return await fetch_all_async(get_booking_list_async, status="Completed")
     elif normalized_status == "cancelled":
-        return get_booking_list(status="Cancelled")
+        return await fetch_all_async(get_booking_list_async, status="Cancelled")
     else:
         # If some unknown status, default to all
-        return get_booking_list(status=None)
+        return await fetch_all_async(get_booking_list_async, status=None)
 
 
-def get_favourite_list(type):
+async def get_favourite_list(type):
     if type == "company":
-        data = get_usr_favourite_list(type="company")
+        data = await get_usr_favourite_list_async(type="company")
         # print(data)
-        filter_data = filter_favourite_usr_companies_key(data)
+        filter_data = filter_favourite_usr_companies_key(data) if data else None
     elif type == "vehicle":
-        data = get_usr_favourite_list(type="vehicle")
+        data = await get_usr_favourite_list_async(type="vehicle")
     elif type == "equipment":
-        data = get_usr_favourite_list(type="equipment")
+        data = await get_usr_favourite_list_async(type="equipment")
         # print(data)
-        filter_data = filter_favourite_equipments_key(data)
+        filter_data = filter_favourite_equipments_key(data) if data else None
     else:
-        data = get_usr_favourite_list(type=None)
+        data = await get_usr_favourite_list_async(type=None)
         # filter_data = filter_favourite_usr_companies_key(data)
     return data
 
-def renter_company_category(cat):
-    data = company_cat_list(cat_search=cat)
+async def renter_company_category(cat):
+    data = await get_category_companies(cat)
+    if data is None:
+        return upstream_error("The category list")
     filter = filter_category_details_key(data)
     return filter
 
 
-def call_user_function(function_name, arg=None):
+async def call_user_function(function_name, arg=None):
 
     if function_name == "get_booking_list":
-        data =  get_user_booking_list(arg)
+        data = await get_user_booking_list(arg)
+        if data is None:
+            return upstream_error("The booking list")
         filter_data = filter_user_orders_key(data)
         # print(filter_data)
         return filter_data
     elif function_name == "get_usr_favourite_list":
-        data = get_favourite_list(type=arg)
+        data = await get_favourite_list(type=arg)
+        if data is None:
+            return upstream_error("The favourite list")
         return data
     elif function_name == "company_cat_list":
-        data = renter_company_category(arg)
+        data = await renter_company_category(arg)
         return data
     else:
         raise ValueError(f"Unknown function name: {function_name}")
 
-def call_payment_list_fun(start_date: str, end_date: str):
-    result = get_payment_list(start_date=start_date, end_date=end_date)
+async def call_payment_list_fun(start_date: str, end_date: str):
+    result = await fetch_all_async(get_payment_list_async, start_date=start_date, end_date=end_date)
+    if result is None:
+        return upstream_error("The payment list")
     filtered_res = filter_user_payment_data(result)
     return filtered_res
 
@@ -1,13 +1,14 @@
+import asyncio
 from typing import Dict, List, Optional, Tuple, Any
 
 from api_function2 import (
-    get_delivery_companies,
-    get_renter_companies,
-    get_vehicle_list,
-    get_equipment_list,
-    get_vehicle_details,
-    get_equipment_details
+    get_vehicle_details_async,
+    get_equipment_details_async
 )
+from request_scope2 import call
+from catalog_cache2 import get_companies, get_company_assets
+from catalog_store import get_catalog_store
+from name_index2 import index_for, company_names, vehicle_names, equipment_names
 
 from filter import (
     filter_company_assets_keys,
@@ -18,51 +19,68 @@ from filter import (
 )
 
 
-def get_companies_list(company_type):
+COMPANY_ROLES = {"get_delivery_companies": "delivery", "get_renter_companies": "renter"}
+
+
+def upstream_error(what: str) -> Dict[str, str]:
+    """Error result for an upstream call that returned nothing."""
+    return {"error": f"❌ {what} is unavailable right now; the Fliz API did not respond. Please try again shortly."}
+
+
+async def get_companies_list(company_type):
+    """Every company of the type, from the catalog cache."""
     if company_type == "get_delivery_companies":
-        return get_delivery_companies()
+        return await get_companies("delivery")
     elif company_type == "get_renter_companies":
-        return get_renter_companies()
+        return await get_companies("renter")
     else:
         raise ValueError("Invalid company_type. Use 'get_delivery_companies' or 'get_renter_companies'.")
 
 
-def find_company_by_name(company_type, target_name):
+async def find_company_by_name(company_type, target_name):
     if not target_name or not isinstance(target_name, str):
         return None
-    raw_data = get_companies_list(company_type)
-    filtered_data = filter_company_info(raw_data)
+    raw_data = await call(get_companies_list, company_type)
+    items = (raw_data or {}).get("data", {}).get("itemList") or []
 
-    for item in filtered_data["items"]:
-        if item.get("name", "").lower() == target_name.lower():
-            return item
-    return None
+    matches = index_for(items, company_names).search(target_name, limit=3)
+    print(f"🔍 Company matches for '{target_name}':", [(item.get("name"), score) for item, score in matches])
+    if matches:
+        company = matches[0][0]
+    else:
+        # Word matches in the snapshot's full-text index, e.g. a city or a word in the middle of the name.
+        found = await asyncio.to_thread(get_catalog_store().search_companies, target_name, COMPANY_ROLES.get(company_type), 1)
+        if not found:
+            return None
+        company = found[0]
+    filtered_data = filter_company_info({"data": {"itemList": [company]}})
+    return filtered_data["items"][0]
 
 
-def get_vehicle_list_for_company(company_id):
-    return get_vehicle_list(company_id)
+async def get_vehicle_list_for_company(company_id):
+    return await get_company_assets("delivery", company_id)
 
 
-def get_equipment_list_for_company(company_id):
-    return get_equipment_list(company_id)
+async def get_equipment_list_for_company(company_id):
+    return await get_company_assets("renter", company_id)
 
 
-def get_company_assets_from_company_id(company_type, company_id):
+async def get_company_assets_from_company_id(company_type, company_id):
     """Call the appropriate asset fetcher based on company_type."""
     if company_type == "get_delivery_companies":
-        return get_vehicle_list_for_company(company_id)
+        return await get_vehicle_list_for_company(company_id)
     elif company_type == "get_renter_companies":
-        return get_equipment_list_for_company(company_id)
+        return await get_equipment_list_for_company(company_id)
     else:
         raise ValueError("Invalid company_type.")
 
 
-def get_single_asset_details_from_asset_id(company_type, company_id, asset_id):
+async def get_single_asset_details_from_asset_id(company_type, company_id, asset_id):
     """Get full asset details using company_id and asset_id."""
     if company_type == "get_delivery_companies":
-        return get_vehicle_details(company_id, asset_id)
+        return await get_vehicle_details_async(asset_id)
     elif company_type == "get_renter_companies":
-        return get_equipment_details(company_id, asset_id)
+        return await get_equipment_details_async(asset_id)
     else:
         raise ValueError("Invalid company_type.")
 
@@ -78,41 +96,50 @@ def find_asset_by_name(company_type, target_name, asset_list):
     item_list = asset_list["data"]["itemList"]
     company_details = asset_list["data"].get("companyDetails", {})
 
-    for item in item_list:
-        asset_name = (
-            item.get("equipmentDetails", {}).get("equipmentName", "")
-            if company_type == "get_renter_companies"
-            else item.get("vehicleDetails", {}).get("sizeType", "")
-        )
-
-        # Allow partial matches
-        if target_name.lower() in asset_name.lower():
-            return filter_all_asset_details_from_company_id(item, company_type, company_details)
+    names = equipment_names if company_type == "get_renter_companies" else vehicle_names
+    # Partial matches and typos are allowed; the best ranked asset wins.
+    item = index_for(item_list, names).best(target_name)
+    if item is None:
+        return None
+    return filter_all_asset_details_from_company_id(item, company_type, company_details)
 
-    return None
+async def handle_company_asset_query(company_type: str, company_name: Optional[str] = None, asset_name: Optional[str] = None):
+    # Every case starts from the company list; find_company_by_name shares this task.
+    company_list = call(get_companies_list, company_type)
 
-def handle_company_asset_query(company_type: str, company_name: Optional[str] = None, asset_name: Optional[str] = None):
     # Case 1: Only company_type provided
     if not company_name and not asset_name:
-        company_list = get_companies_list(company_type)
-        filtered_companies = filter_company_info(company_list)
+        if await company_list is None:
+            return upstream_error("The company list")
+        filtered_companies = filter_company_info(company_list.result())
         return {"companies": filtered_companies}
 
     # Case 2: company_type and company_name provided
-    company = find_company_by_name(company_type, company_name)
+    company = await find_company_by_name(company_type, company_name)
     if not company:
+        if await company_list is None:
+            return upstream_error("The company list")
         return {"error": f"❌ Company '{company_name}' not found under type '{company_type}'."}
 
+    # Cases 2 and 3 both need the asset list of the matched company.
+    assets_task = call(get_company_assets_from_company_id, company_type, company["_id"])
+
     if not asset_name:
         if company_type == "get_renter_companies":
+            equipment_list = await assets_task
+            if equipment_list is None:
+                return upstream_error(f"The equipment list of '{company_name}'")
             return {
                 "company": company,
-                "equipment_list": get_equipment_list_for_company(company["_id"])
+                "equipment_list": equipment_list
             }
         elif company_type == "get_delivery_companies":
+            vehicle_list = await assets_task
+            if vehicle_list is None:
+                return upstream_error(f"The vehicle list of '{company_name}'")
             return {
                 "company": company,
-                "vehicle_list": get_vehicle_list_for_company(company["_id"])
+                "vehicle_list": vehicle_list
             }
         else:
             return {
@@ -121,15 +148,22 @@ def handle_company_asset_query(company_type: str, company_name: Optional[str] =
             }
 
     # Case 3: All three provided
-    assets = get_company_assets_from_company_id(company_type, company["_id"])
+    assets = await assets_task
+    if assets is None:
+        return upstream_error(f"The asset list of '{company_name}'")
     if not assets or "data" not in assets or "itemList" not in assets["data"]:
         return {"error": f"❌ No assets found for company '{company_name}'."}
 
-    filtered_assets = filter_company_assets_keys(company_type, assets)
-
     print(f"🔍 Searching for asset by name: '{asset_name}'...")
 
     asset = find_asset_by_name(company_type, asset_name, assets)
+    if asset is None:
+        # Word matches among the company's assets in the snapshot's full-text index.
+        found = await asyncio.to_thread(
+            get_catalog_store().search_assets, asset_name, COMPANY_ROLES.get(company_type), company["_id"], 1)
+        if found:
+            asset = filter_all_asset_details_from_company_id(
+                found[0]["item"], company_type, assets["data"].get("companyDetails", {}))
     if asset:
         asset_id = asset.get("equipment_id") or asset.get("vehicle_id")
         if asset_id:
@@ -139,6 +173,15 @@ def handle_company_asset_query(company_type: str, company_name: Optional[str] =
     else:
         print(f"❌ Asset '{asset_name}' not found.")
 
+    # The details request starts before the asset list is filtered, which it does not need.
+    details = None
+    if asset and company_type == "get_renter_companies" and asset.get("equipment_id"):
+        details = call(get_equipment_details_async, asset["equipment_id"])
+    elif asset and company_type == "get_delivery_companies" and asset.get("vehicle_id"):
+        details = call(get_vehicle_details_async, asset["vehicle_id"])
+
+    filtered_assets = filter_company_assets_keys(company_type, assets)
+
     if not asset:
         return {
             "company": company,
@@ -146,27 +189,28 @@ def handle_company_asset_query(company_type: str, company_name: Optional[str] =
             "error": f"❌ Asset '{asset_name}' not found under company '{company_name}'."
         }
 
-    details = None
-    if company_type == "get_renter_companies" and asset.get("equipment_id"):
-        details = get_equipment_details(asset["equipment_id"])
-        filter_details = filter_equipment_details(details)
+    if details is None:
         return {
             "company": company,
             "filtered_assets": filtered_assets,
-            "equipment_details": filter_details
         }
-    elif company_type == "get_delivery_companies" and asset.get("vehicle_id"):
-        details = get_vehicle_details(asset["vehicle_id"])
-        filter_details = filter_vehicle_details(details)
+    details = await details
+    if details is None:
         return {
             "company": company,
             "filtered_assets": filtered_assets,
-            "vehicle_details": filter_details
+            **upstream_error(f"The details of '{asset_name}'")
+        }
+    if company_type == "get_renter_companies":
+        return {
+            "company": company,
+            "filtered_assets": filtered_assets,
+            "equipment_details": filter_equipment_details(details)
         }
-
     return {
         "company": company,
         "filtered_assets": filtered_assets,
+        "vehicle_details": filter_vehicle_details(details)
     }
 
 